@@ -1,28 +1,14 @@
-import spacy
-from spacy.matcher import Matcher
-from fuzzywuzzy import fuzz
-import re
-
-# Define function to multiply last character in a string if it's followed by a digit.
-# For example, 'A3' becomes 'AAA', 'B2' becomes 'BB' etc.
-def replicate_last_char(input_str):
-    # Search for a pattern that ends with a letter followed by one or more digits
-    match = re.search(r"([a-zA-Z])(\d+)$", input_str)
-    if match:
-        # If pattern is found, extract the letter and digit
-        items = match.groups()
-        # Return the string with last digit characters replaced by the replicated last letter
-        return input_str[:-len(items[1])] + items[0] * (int(items[1]) - 1)
+from rapidfuzz import fuzz
+from text_normalization import SymbolRemover, clean_abbreviation, replicate_last_char
+import model_registry
+
+# This older detector keeps hyphens in the text
+symbol_remover = SymbolRemover(",()’")
+
 
 # Define function to remove specific symbols from a text
 def remove_symbols(text):
-    # Define symbols to be removed
-    symbols = ",()’"
-    # For each symbol, replace it with an empty string in the text
-    for symbol in symbols:
-        text = text.replace(symbol, "")
-    # Return text after removing symbols
-    return text
+    return symbol_remover.remove(text)
 
 
 # Define function to extract potential abbreviations from a SpaCy document
@@ -98,8 +84,7 @@ def sublist_exists(uppercase_chars, abbr_chars, pos, matched_indx):
 # Function to determine if a potential full form is a valid expansion of an abbreviation
 def is_full_form(abbreviation, potential_full_form, threshold):
     # Clean abbreviation by removing certain special characters
-    for i in ['@', '&', "/", "\\"]:
-        abbreviation = abbreviation.replace(i, "")
+    abbreviation = clean_abbreviation(abbreviation)
     # Convert the cleaned abbreviation into a list of characters
     abbr_chars = list(abbreviation)
     # Split the potential full form into a list of words
@@ -138,7 +123,8 @@ def is_full_form(abbreviation, potential_full_form, threshold):
         abbreviation = replicate_last_char(abbreviation)
 
     # Calculate the fuzzy match score between the abbreviation and the candidate full form
-    match_score = fuzz.ratio(abbreviation, candidate_caps)
+    # (rounded to a whole number, as fuzzywuzzy did)
+    match_score = round(fuzz.ratio(abbreviation, candidate_caps))
     # If the match score exceeds the threshold, return the full form
     if match_score >= threshold:
         return full_form
@@ -173,24 +159,14 @@ def get_abbreviations_definition(doc, matcher, threshold):
     return abbreviations_full_forms
 
 def get_abbreviations(text, signal):
-    # Load the Spacy English model
-    nlp = spacy.load("en_core_web_sm")
+    # Get the process-wide Spacy English model
+    nlp = model_registry.get_nlp()
     
     # Emit signal
     signal.emit(40)
     
-    # Initialize a Matcher with the shared vocabulary
-    matcher = Matcher(nlp.vocab)
-
-    # Define a pattern to match capitalized words
-    abbreviation_pattern1 = [{"IS_UPPER": True}]
-
-    # Define a pattern to match abbreviations like 'Ph.D.'
-    abbreviation_pattern2 = [{"TEXT": {"REGEX": r'\b[A-Za-z]+\.[A-Za-z\.]*'}}]
-
-    # Add the patterns to the matcher
-    matcher.add("Abbreviation1", [abbreviation_pattern1])
-    matcher.add("Abbreviation2", [abbreviation_pattern2])
+    # Get the Matcher built on the shared vocabulary
+    matcher = model_registry.get_matcher()
 
     # Emit signal
     signal.emit(50)
@@ -202,7 +178,7 @@ def get_abbreviations(text, signal):
     signal.emit(60)
     
     # Process the text with the Spacy model
-    doc = nlp(text)
+    doc = nlp(text, disable=["abbreviation_detector"])
 
     # Emit signal
     signal.emit(65)
@@ -1,23 +1,17 @@
-import spacy
-from spacy.matcher import Matcher
-from scispacy.abbreviation import AbbreviationDetector
-from fuzzywuzzy import fuzz
-from collections import Counter
-import re
-import sys
-import os
-
-# Define function to multiply last character in a string if it's followed by a digit.
-# For example, 'A3' becomes 'AAA', 'B2' becomes 'BB' etc.
-def replicate_last_char(input_str):
-    # Search for a pattern that ends with a letter followed by one or more digits
-    match = re.search(r"([a-zA-Z])(\d+)$", input_str)
-    if match:
-        # If pattern is found, extract the letter and digit
-        items = match.groups()
-        # Return the string with last digit characters replaced by the replicated last letter
-        return input_str[:-len(items[1])] + items[0] * (int(items[1]) - 1)
+from spacy.tokens import Doc
+from array import array
+from rapidfuzz import fuzz, process
+from collections import Counter, OrderedDict, deque
+from bisect import bisect_left, bisect_right
+from instrumentation import measure, count_tokens
+from text_normalization import symbol_remover, remove_word_symbols, clean_abbreviation, replicate_last_char
+import model_registry
 
+# Version of the detection logic. Bump it whenever detection results change, so cached results are not reused.
+DETECTOR_VERSION = 4
+
+# Key of the user_data of a Doc from remove_symbol_tokens holding the source offset of each of its tokens
+SOURCE_OFFSETS = "source_offsets"
 
 def select_best_match(abbreviation_dict):
     result_dict = {}
@@ -32,7 +26,8 @@ def select_best_match(abbreviation_dict):
         occurrences = Counter(capitals)
         capitals = [''.join([char for char in value if char.isupper()]) for value in capitals]
 
-        scores = [fuzz.ratio(key.strip(), capital) for capital in capitals]
+        # Score all the candidates in one call
+        scores = match_scores(key.strip(), capitals)
 
         # Find the index of the highest score
         best_index = scores.index(max(scores))
@@ -52,16 +47,104 @@ def select_best_match(abbreviation_dict):
     return result_dict
 
 
-# Define function to remove specific symbols from a text
-def remove_symbols(text):
-    # Define symbols to be removed
-    symbols = ",()’-"
-    # For each symbol, replace it with an empty string in the text
-    for symbol in symbols:
-        text = text.replace(symbol, "")
-    
-    # Return text after removing symbols
-    return text
+# Function to add the whitespace between two tokens the way the tokenizer does: a first space follows the
+# previous token, and the rest of the whitespace becomes a whitespace token, whose source offset is recorded
+def add_whitespace(words, spaces, sources, whitespace, offset):
+    if words and whitespace.startswith(" "):
+        spaces[-1] = True
+        whitespace = whitespace[1:]
+        offset += 1
+    if whitespace:
+        words.append(whitespace)
+        spaces.append(False)
+        sources.append(offset)
+
+
+# Define function to remove the same symbols as remove_symbols from the tokens of a parsed document.
+# Returns a new Doc over the cleaned tokens, so the text does not have to be parsed a second time.
+# The tokenizer splits text on whitespace and tokenizes each piece between whitespace on its own, so only
+# the pieces that held a symbol are tokenized again, e.g. "(POA&M)." becomes "POA&M." and "we’ve" becomes
+# "we" and "ve", the same tokens as tokenizing the text with the symbols removed (but for the few special
+# cases of the tokenizer that span a space, like "' '").
+# The offset in the text of doc where each cleaned token starts is kept in the user_data of the new Doc,
+# under SOURCE_OFFSETS, so detections in it can be located in the original text without searching it.
+# When sorted token positions are given as boundaries, also returns where each lands in the new Doc.
+def remove_symbol_tokens(doc, tokenizer, boundaries=None):
+    words = []
+    spaces = []
+    sources = array('q')
+    positions = []
+    # Texts of the tokens of the current piece, up to the next whitespace, where they start, and whether any
+    # holds a symbol
+    piece = []
+    piece_sources = []
+    changed = False
+    # Whitespace since the last piece kept, which pieces made only of symbols no longer split, and where it starts
+    gap = ""
+    gap_start = 0
+    reached = 0
+    # Tokens of each piece cleaned, with their offsets in it, as the same pieces come back often, e.g. "(NLP)"
+    retokenized = {}
+
+    for token in doc:
+        while boundaries is not None and reached < len(boundaries) and boundaries[reached] <= token.i:
+            reached += 1
+        word = token.text
+        if token.is_space:
+            if not gap:
+                gap_start = token.idx
+            gap += word + token.whitespace_
+            continue
+
+        piece.append(word)
+        piece_sources.append(token.idx)
+        changed = changed or remove_word_symbols(word) != word
+        # The piece goes on up to whitespace, or up to a whitespace token
+        space = token.whitespace_
+        if not space and token.i + 1 < len(doc) and not doc[token.i + 1].is_space:
+            continue
+
+        if changed:
+            # The tokens of a piece are contiguous, so its text is theirs joined
+            joined = ''.join(piece)
+            if joined not in retokenized:
+                cleaned, offsets = symbol_remover.remove_with_offsets(joined)
+                cleaned_tokens = tokenizer(cleaned) if cleaned else []
+                retokenized[joined] = ([piece_token.text for piece_token in cleaned_tokens],
+                                       [offsets.to_original(piece_token.idx) for piece_token in cleaned_tokens])
+            piece, piece_offsets = retokenized[joined]
+            piece_sources = [piece_sources[0] + offset for offset in piece_offsets]
+
+        # Drop pieces made only of symbols, keeping the whitespace around them
+        if piece:
+            if gap == " " and words:
+                spaces[-1] = True
+            elif gap:
+                add_whitespace(words, spaces, sources, gap, gap_start)
+            gap = ""
+            # Boundaries reached land at the start of the next piece kept
+            if reached > len(positions):
+                positions.extend([len(words)] * (reached - len(positions)))
+            words.extend(piece)
+            spaces.extend([False] * len(piece))
+            sources.extend(piece_sources)
+        if space and not gap:
+            gap_start = token.idx + len(word)
+        gap += space
+        piece = []
+        piece_sources = []
+        changed = False
+    add_whitespace(words, spaces, sources, gap, gap_start)
+
+    # Build a document over the cleaned tokens with the same vocabulary
+    clean_doc = Doc(doc.vocab, words=words, spaces=spaces)
+    clean_doc.user_data[SOURCE_OFFSETS] = sources
+    if boundaries is None:
+        return clean_doc
+
+    # Boundaries at or past the last token land at the end of the new Doc
+    positions.extend([len(words)] * (len(boundaries) - len(positions)))
+    return clean_doc, positions
 
 
 # Define function to extract potential abbreviations from a SpaCy document
@@ -85,24 +168,40 @@ def get_abbreviations(doc, matcher):
 
 
 
+# Function to build an index from token text to the positions of that text in the document.
+# Built once per document so candidate expansions are found without scanning every token.
+# Only the tokens in [start, end) are indexed, so abbreviations outside that range are skipped.
+def build_token_index(doc, start=0, end=None):
+    token_index = dict()
+
+    for token in doc[start:end]:
+        token_index.setdefault(token.text, []).append(token.i)
+
+    return token_index
+
+
 # Function to get candidate expansions for a given abbreviation from the document
-def get_candidate_expansions(abbreviation, doc):
+def get_candidate_expansions(abbreviation, doc, token_index=None):
     # Initialize an empty list to hold the candidate expansions
     candidates = []
 
-    # Iterate over each token in the document
-    for token in doc:
-        # If the token text matches the abbreviation
-        if token.text == abbreviation:
-            # Look for potential full forms before the abbreviation
-            # Calculate start and end indices for potential full form by going 
-            # a few tokens before and after the abbreviation token's index.
-            start = max(0, token.i - len(abbreviation) - 1)
-            end = max(0, token.i + len(abbreviation) + 1)
-            # Append potential full forms from before the abbreviation to candidates list
-            candidates.append(doc[start:token.i])
-            # Append potential full forms from after the abbreviation to candidates list
-            candidates.append(doc[token.i + 1:end])
+    # Look up the positions of the abbreviation, or scan every token when there is no index
+    if token_index is not None:
+        positions = token_index.get(abbreviation, [])
+    else:
+        positions = [token.i for token in doc if token.text == abbreviation]
+
+    # For each position where the token text matches the abbreviation
+    for i in positions:
+        # Look for potential full forms before the abbreviation
+        # Calculate start and end indices for potential full form by going 
+        # a few tokens before and after the abbreviation token's index.
+        start = max(0, i - len(abbreviation) - 1)
+        end = max(0, i + len(abbreviation) + 1)
+        # Append potential full forms from before the abbreviation to candidates list
+        candidates.append(doc[start:i])
+        # Append potential full forms from after the abbreviation to candidates list
+        candidates.append(doc[i + 1:end])
 
     # Return the list of candidate expansions
     return candidates
@@ -135,11 +234,26 @@ def sublist_exists(uppercase_chars, abbr_chars, pos, matched_indx):
     return pos, matched_indx
 
 
-# Function to determine if a potential full form is a valid expansion of an abbreviation
-def is_full_form(abbreviation, potential_full_form, threshold):
-    # Clean abbreviation by removing certain special characters
-    for i in ['@', '&', "/", "\\"]:
-        abbreviation = abbreviation.replace(i, "")
+# Function to score a text against each of a list of texts in one batched call.
+# Scores are rounded to whole numbers like fuzzywuzzy's fuzz.ratio. rapidfuzz's ratio comes from the Indel
+# distance, not from difflib's SequenceMatcher that fuzzywuzzy used without python-Levenshtein, so some
+# scores differ from the ones fuzzywuzzy gave and can fall on the other side of the threshold.
+def match_scores(text, choices):
+    scores = process.cdist([text], choices, scorer=fuzz.ratio)[0]
+    return [int(round(float(score))) for score in scores]
+
+
+# Function to get the abbreviation that candidate capitals are scored against
+def get_scored_abbreviation(abbreviation):
+    # If the abbreviation contains a number, replicate the last character of the abbreviation
+    if any(char.isdigit() for char in abbreviation):
+        abbreviation = replicate_last_char(abbreviation)
+    return abbreviation
+
+
+# Function to cut a potential full form down to the words that match a cleaned abbreviation.
+# Returns the full form and its capital letters, or None if there are no words.
+def get_full_form_candidate(abbreviation, potential_full_form):
     # Convert the cleaned abbreviation into a list of characters
     abbr_chars = list(abbreviation)
     # Split the potential full form into a list of words
@@ -173,64 +287,185 @@ def is_full_form(abbreviation, potential_full_form, threshold):
     # Keep only the uppercase characters in the candidate full form
     candidate_caps = "".join([char for char in candidate_caps if char.isupper()])
 
-    # If the abbreviation contains a number, replicate the last character of the abbreviation
-    if any(char.isdigit() for char in abbreviation):
-        abbreviation = replicate_last_char(abbreviation)
+    return full_form, candidate_caps
 
-    if full_form == abbreviation:
-        return None
 
-    # Calculate the fuzzy match score between the abbreviation and the candidate full form
-    match_score = fuzz.ratio(abbreviation, candidate_caps)
-    # If the match score exceeds the threshold, return the full form
-    if match_score >= threshold:
-        return full_form
-
-    # if abbreviation in candidate_caps:
-    #     return full_form
+# Function to determine if a potential full form is a valid expansion of an abbreviation
+def is_full_form(abbreviation, potential_full_form, threshold):
+    full_forms = get_full_forms(abbreviation, [potential_full_form], threshold)
     # If no full form passed the match score threshold, return None
-    return None
+    return full_forms[0] if full_forms else None
+
+
+class FullFormCache:
+    """
+    A bounded least-recently-used memo of full form checks, keyed by
+    (cleaned abbreviation, candidate text, threshold).
+
+    The same acronym is often surrounded by the same words all over a document,
+    so most candidate windows have been checked before.
+
+    Attributes
+    ----------
+    maxsize : int
+        the largest number of results kept
+    hits : int
+        the number of lookups that found a result
+    misses : int
+        the number of lookups that did not
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def get(self, key, default=None):
+        """
+        Returns the result stored for a key, or default when there is none.
+        """
+        if key in self._results:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return self._results[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, result):
+        """
+        Stores a result, dropping the least recently used one when the cache is full.
+        """
+        self._results[key] = result
+        self._results.move_to_end(key)
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every result and resets the counters.
+        """
+        self._results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """
+        Returns the hits, misses and current size of the cache.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._results), "maxsize": self.maxsize}
+
+
+# Process-wide memo of full form checks
+full_form_cache = FullFormCache()
+
+# Marks a candidate that is not in the memo yet
+_MISSING = object()
+
+
+# Function to get the valid expansions of an abbreviation among its potential full forms.
+# Candidates checked before are looked up in the memo; the others are scored in a single call.
+def get_full_forms(abbreviation, potential_full_forms, threshold):
+    abbreviation = clean_abbreviation(abbreviation)
+    scored_abbreviation = get_scored_abbreviation(abbreviation)
+
+    # Result of each potential full form: the full form, or None
+    results = []
+    # Position of the first result of each key that is not in the memo yet
+    missing = dict()
+    # Positions of the results repeating an earlier window of this call
+    repeated = []
+    # Positions and (full form, caps) of the candidates that still need scoring
+    pending = []
+    for potential_full_form in potential_full_forms:
+        # Only the words of the window matter, so windows differing in whitespace share a result
+        key = (abbreviation, ' '.join(str(potential_full_form).split()), threshold)
+        if key in missing:
+            # Same window as an earlier one of this call, counted as a hit
+            full_form_cache.hits += 1
+            repeated.append((len(results), missing[key]))
+            results.append(None)
+            continue
+
+        result = full_form_cache.get(key, _MISSING)
+        if result is _MISSING:
+            missing[key] = len(results)
+            result = None
+            candidate = get_full_form_candidate(abbreviation, key[1])
+            # An abbreviation whose digits cannot be expanded scores 0 against everything
+            if candidate is not None and candidate[0] != scored_abbreviation and scored_abbreviation is not None:
+                pending.append((len(results), candidate))
+        results.append(result)
+
+    if pending:
+        # Calculate the fuzzy match scores between the abbreviation and the candidate full forms
+        scores = match_scores(scored_abbreviation, [candidate_caps for _, (_, candidate_caps) in pending])
+        for (index, (full_form, _)), score in zip(pending, scores):
+            # Keep the full form if its match score reaches the threshold
+            if score >= threshold:
+                results[index] = full_form
+
+    for index, first in repeated:
+        results[index] = results[first]
+
+    # Remember the results that were just worked out
+    for key, index in missing.items():
+        full_form_cache.put(key, results[index])
+
+    return [result for result in results if result is not None]
 
 
 # Function to get the definition of abbreviations in a document
-def get_abbreviations_definition(doc, matcher, threshold):
+# Only the occurrences in the tokens [start, end) are used; their candidate windows may reach outside it.
+# The potential abbreviations can be given when the matcher already ran over the document.
+# When a dictionary is given as occurrences, the token positions in [start, end) of each abbreviation with
+# full forms are added to it, from the same token index.
+def get_abbreviations_definition(doc, matcher, threshold, start=0, end=None, potential_abbreviations=None,
+                                 occurrences=None):
     # Get a set of potential abbreviations from the document
-    potential_abbreviations = get_abbreviations(doc, matcher)
+    if potential_abbreviations is None:
+        potential_abbreviations = get_abbreviations(doc, matcher)
     # Initialize an empty dictionary to hold the candidate expansions for each abbreviation
     abbreviations = dict()
 
     # For each potential abbreviation, get its candidate expansions from the document
     abbreviations_full_forms = dict()
+    # Index the token positions once instead of scanning the document for every abbreviation
+    token_index = build_token_index(doc, start, end)
     for potential_abbreviation in potential_abbreviations:
-        abbreviations[potential_abbreviation] = get_candidate_expansions(potential_abbreviation, doc)
+        abbreviations[potential_abbreviation] = get_candidate_expansions(potential_abbreviation, doc, token_index)
 
     # For each abbreviation and its candidate expansions
     for abbreviation in abbreviations:
-        # For each candidate expansion of the abbreviation
-        for potential_abbreviation in abbreviations[abbreviation]:
-            # Check if the candidate expansion is a valid full form of the abbreviation
-            full_form = is_full_form(abbreviation, potential_abbreviation, threshold)
-            # If a valid full form is found, add it to the dictionary of full forms
-            if full_form:
-                if abbreviation in abbreviations_full_forms:
-                    abbreviations_full_forms[str(abbreviation)].append(str(full_form))
-                else:
-                    abbreviations_full_forms[str(abbreviation)] = [str(full_form)]
-        
+        # Check all candidate expansions of the abbreviation at once
+        full_forms = get_full_forms(abbreviation, abbreviations[abbreviation], threshold)
+        # If valid full forms are found, add them to the dictionary of full forms
+        if full_forms:
+            abbreviations_full_forms[str(abbreviation)] = [str(full_form) for full_form in full_forms]
+            if occurrences is not None:
+                occurrences.setdefault(str(abbreviation), []).extend(token_index.get(abbreviation, []))
+
     # Return the dictionary of abbreviations and their full forms
     return abbreviations_full_forms
 
-def scispacy_abbreviation_detector(text):
-    nlp = spacy.load("en_core_web_sm")
-    nlp.add_pipe("abbreviation_detector")
+def scispacy_abbreviation_detector(text, nlp=None):
+    # Reuse the process-wide pipeline, which already has the abbreviation detector attached
+    if nlp is None:
+        nlp = model_registry.get_nlp()
 
     doc = nlp(text)
 
+    return get_scispacy_abbreviations(doc)
+
+
+# Function to collect the abbreviations found by the scispacy detector on a processed document
+def get_scispacy_abbreviations(doc):
     dictoab = dict()
 
+    # The detector stores plain dicts (make_serializable) so docs can come back from nlp.pipe processes
     for abrv in doc._.abbreviations:
-        if abrv not in dictoab:
-            dictoab[str(abrv)] = str(abrv._.long_form)
+        if abrv["short_text"] not in dictoab:
+            dictoab[abrv["short_text"]] = abrv["long_text"]
 
     return dictoab
 
@@ -245,58 +480,274 @@ Full-service RMF operation. Not only do we perform all RMF steps and several RMF
 Agility. We are agile, and have repeatedly proven that we can easily adapt to emerging/shifting mission needs.
 """
 
-def find_abbreviations(text, signal):
-    # Load the Spacy English model
-    signal.emit(10)
+# Function to pick the best full form of each abbreviation and add the ones only scispacy found
+def merge_abbreviations(full_forms, scispacy_abbreviations):
+    result = select_best_match(full_forms)
+    for abbr in scispacy_abbreviations:
+        if abbr not in result:
+            result[abbr] = scispacy_abbreviations[abbr]
+    return result
 
-    BASE_DIR = os.path.abspath('.')
-        
-    try:
-        nlp = spacy.load(os.path.join(BASE_DIR, 'en_core_web_sm'))
-    except Exception as e:
-        print(BASE_DIR, "ERROR", e)
-        return {}
 
-    # Initialize a Matcher with the shared vocabulary
-    matcher = Matcher(nlp.vocab)
-    signal.emit(30)
+# Function to emit progress on a Qt signal, if there is one
+def emit_progress(signal, value):
+    if signal is not None:
+        signal.emit(value)
 
-    # Define a pattern to match capitalized words
-    abbreviation_pattern1 = [{"IS_UPPER": True}]
 
-    # Define a pattern to match abbreviations like 'Ph.D.'
-    abbreviation_pattern2 = [{"TEXT": {"REGEX": r'\b[A-Za-z]+\.[A-Za-z\.]*'}}]
+# Function to find the abbreviations of a text and their definitions.
+# In fast mode only the components the detection needs are loaded (see model_registry).
+# When a dictionary is given as occurrences, it is filled like get_doc_abbreviations fills it.
+def find_abbreviations(text, signal=None, fast=False, occurrences=None):
+    # Load the Spacy English model
+    emit_progress(signal, 10)
+
+    with measure(signal, "load_model"):
+        try:
+            nlp = model_registry.get_nlp(fast=fast)
+        except Exception as e:
+            print(model_registry.BASE_DIR, "ERROR", e)
+            return {}
+
+        # Get the Matcher built on the shared vocabulary
+        matcher = model_registry.get_matcher(fast=fast)
+    emit_progress(signal, 30)
+
+    # Process the text with the Spacy model once, this also runs the scispacy abbreviation detector
+    with measure(signal, "nlp"):
+        doc = nlp(text)
+    count_tokens(signal, "nlp", len(doc))
+
+    return get_doc_abbreviations(doc, nlp.tokenizer, matcher, 80, signal, occurrences)
+
+
+# Function to find the abbreviations of many texts (documents or paragraphs) in batches.
+# nlp.pipe amortizes the pipeline overhead, and n_process > 1 spreads the parsing over several cores.
+# Yields one dictionary of abbreviations per text, in the order of the texts.
+def find_abbreviations_batch(texts, batch_size=16, n_process=1, fast=False, threshold=80):
+    nlp = model_registry.get_nlp(fast=fast)
+    matcher = model_registry.get_matcher(fast=fast)
+
+    for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+        yield get_doc_abbreviations(doc, nlp.tokenizer, matcher, threshold)
+
+
+# Number of cleaned tokens that must follow or precede an abbreviation in a chunk, enough for its
+# candidate windows. Occurrences closer than this to the end of a chunk are left for the next chunk.
+STREAM_WINDOW = 32
+
+
+# Function to group paragraphs into chunks of about max_chars characters, joined like DocAcronymMaster.get_text
+def chunk_paragraphs(paragraphs, max_chars):
+    chunk = []
+    size = 0
+    for paragraph in paragraphs:
+        if chunk and size + len(paragraph) > max_chars:
+            yield ' '.join(chunk)
+            chunk = []
+            size = 0
+        chunk.append(paragraph)
+        size += len(paragraph) + 1
+
+    if chunk:
+        yield ' '.join(chunk)
+
+
+# Function to get the raw text of the end of a processed chunk, holding at least `words` tokens
+# that are not only symbols (so that enough tokens are left once the symbols are removed).
+# Trailing whitespace is kept, so joining the tail to the next chunk gives the text the paragraphs join to.
+def get_chunk_tail(doc, words):
+    count = 0
+    start = len(doc)
+    while start > 0 and count < words:
+        start -= 1
+        if remove_word_symbols(doc[start].text):
+            count += 1
+    return doc[start:].text_with_ws
+
+
+# Function to find the abbreviations of a document given as a stream of paragraphs.
+# Paragraphs are processed in chunks so memory stays about the same whatever the document size.
+# Each chunk starts with the end of the previous one, so definitions across chunk boundaries are found,
+# and every abbreviation occurrence is counted once, in the chunk where its whole window is available.
+def find_abbreviations_stream(paragraphs, signal=None, fast=False, chunk_chars=100000, threshold=80):
+    # Load the Spacy English model
+    emit_progress(signal, 10)
+
+    with measure(signal, "load_model"):
+        try:
+            nlp = model_registry.get_nlp(fast=fast)
+        except Exception as e:
+            print(model_registry.BASE_DIR, "ERROR", e)
+            return {}
+
+        # Get the Matcher built on the shared vocabulary
+        matcher = model_registry.get_matcher(fast=fast)
+    emit_progress(signal, 30)
+
+    dictoab1 = dict()
+    dictoab2 = dict()
+    tail = ""
+    clean_doc = None
+    # Number of cleaned tokens at the end of the previous chunk whose occurrences were deferred
+    deferred = 0
+
+    for chunk in chunk_paragraphs(paragraphs, chunk_chars):
+        # Process the chunk after the end of the previous one
+        with measure(signal, "nlp"):
+            doc = nlp(tail + ' ' + chunk if tail else chunk)
+        count_tokens(signal, "nlp", len(doc))
+        for abbr, long_form in get_scispacy_abbreviations(doc).items():
+            dictoab1.setdefault(abbr, long_form)
+
+        # Remove certain symbols from the tokens of the processed chunk
+        with measure(signal, "remove_symbol_tokens"):
+            clean_doc = remove_symbol_tokens(doc, nlp.tokenizer)
+            tail_length = len(remove_symbol_tokens(nlp.make_doc(tail), nlp.tokenizer)) if tail else 0
+
+        # Count the occurrences deferred by the previous chunk, then everything up to the last window
+        start = max(0, tail_length - deferred)
+        end = max(start, len(clean_doc) - STREAM_WINDOW)
+        with measure(signal, "get_abbreviations_definition"):
+            chunk_full_forms = get_abbreviations_definition(clean_doc, matcher, threshold, start, end)
+        for abbr, full_forms in chunk_full_forms.items():
+            dictoab2.setdefault(abbr, []).extend(full_forms)
+
+        # Keep enough of this chunk to give the deferred occurrences their windows in the next one
+        deferred = len(clean_doc) - end
+        tail = get_chunk_tail(doc, 2 * (deferred + STREAM_WINDOW))
+
+    # Nothing follows the last chunk, so its deferred occurrences can be counted now
+    if clean_doc is not None and deferred:
+        with measure(signal, "get_abbreviations_definition"):
+            chunk_full_forms = get_abbreviations_definition(clean_doc, matcher, threshold, len(clean_doc) - deferred)
+        for abbr, full_forms in chunk_full_forms.items():
+            dictoab2.setdefault(abbr, []).extend(full_forms)
+
+    emit_progress(signal, 60)
+
+    with measure(signal, "merge_abbreviations"):
+        dictoab2 = merge_abbreviations(dictoab2, dictoab1)
+
+    emit_progress(signal, 70)
 
-    # Add the patterns to the matcher
-    matcher.add("Abbreviation1", [abbreviation_pattern1])
-    matcher.add("Abbreviation2", [abbreviation_pattern2])
+    return dictoab2
 
-    dictoab1 = scispacy_abbreviation_detector(text)
 
-    signal.emit(50)
+# Number of words on each side of a paragraph that can change the abbreviations found in it
+PARAGRAPH_CONTEXT_WORDS = 2 * STREAM_WINDOW
+
+
+# Function to get, for each paragraph, the words just before it and just after it in the document
+def get_paragraph_contexts(paragraphs, words=PARAGRAPH_CONTEXT_WORDS):
+    before = []
+    window = deque(maxlen=words)
+    for paragraph in paragraphs:
+        before.append(' '.join(window))
+        window.extend(paragraph.split())
+
+    # Going backwards, the window holds the following words in reverse order
+    after = []
+    window = deque(maxlen=words)
+    for paragraph in reversed(paragraphs):
+        after.append(' '.join(reversed(window)))
+        window.extend(reversed(paragraph.split()))
+    after.reverse()
+
+    return list(zip(before, after))
+
+
+# Function to find the candidate full forms and scispacy abbreviations of each paragraph of a block of
+# consecutive paragraphs, parsed once together with the words before and after the block.
+# Returns one {"full_forms": ..., "scispacy": ...} dictionary per paragraph, to be merged with merge_abbreviations.
+def find_paragraph_candidates(paragraphs, before, after, nlp, matcher, threshold, signal=None):
+    # Join the paragraphs like DocAcronymMaster.get_text, with the context around them
+    parts = ([before] if before else []) + paragraphs + ([after] if after else [])
+    with measure(signal, "nlp"):
+        doc = nlp(' '.join(parts))
+    count_tokens(signal, "nlp", len(doc))
+
+    # Character offset where each paragraph starts, and where the last one ends
+    offsets = []
+    offset = len(before) + 1 if before else 0
+    for paragraph in paragraphs:
+        offsets.append(offset)
+        offset += len(paragraph) + 1
+    offsets.append(offset - 1)
+
+    # Token position of each of those offsets, before and after removing the symbols
+    token_starts = [token.idx for token in doc]
+    bounds = [bisect_left(token_starts, offset) for offset in offsets]
+    with measure(signal, "remove_symbol_tokens"):
+        clean_doc, clean_bounds = remove_symbol_tokens(doc, nlp.tokenizer, bounds)
+
+    # Run the matcher once for the block, then count the occurrences paragraph by paragraph
+    candidates = []
+    with measure(signal, "get_abbreviations_definition"):
+        potential_abbreviations = get_abbreviations(clean_doc, matcher)
+        for k in range(len(paragraphs)):
+            full_forms = get_abbreviations_definition(clean_doc, matcher, threshold, clean_bounds[k],
+                                                      clean_bounds[k + 1], potential_abbreviations)
+            candidates.append({"full_forms": full_forms, "scispacy": {}})
+
+    # Give each scispacy abbreviation to the paragraph that defines it. The detector also lists every other
+    # occurrence of a defined short form, with the long form of its definition, which can be anywhere in the
+    # document: filed under the paragraph of the occurrence, an unchanged paragraph would keep an old definition.
+    # Definitions in the context around the block belong to the paragraphs there.
+    for abrv in doc._.abbreviations:
+        k = bisect_right(bounds, abrv["long_start"]) - 1
+        if 0 <= k < len(paragraphs):
+            candidates[k]["scispacy"].setdefault(abrv["short_text"], abrv["long_text"])
 
-    # Remove certain symbols from the text
-    text = remove_symbols(text)
+    return candidates
 
-    # Process the text with the Spacy model
-    doc = nlp(text)
+
+# Function to get the abbreviations of a processed document and their definitions.
+# When a dictionary is given as occurrences, it is filled with the offsets in the text of doc where each
+# abbreviation found occurs, for text_normalization.NormalizedText.locate_original to locate them.
+def get_doc_abbreviations(doc, tokenizer, matcher, threshold, signal=None, occurrences=None):
+    # Abbreviations found by the scispacy detector while the document was processed
+    dictoab1 = get_scispacy_abbreviations(doc)
+
+    emit_progress(signal, 50)
+
+    # Remove certain symbols from the tokens of the processed document
+    with measure(signal, "remove_symbol_tokens"):
+        clean_doc = remove_symbol_tokens(doc, tokenizer)
 
     # Get a dictionary of abbreviations and their full forms from the processed text
-    dictoab2 = get_abbreviations_definition(doc, matcher, 80)
-    # Print each abbreviation and its full form
+    token_occurrences = None if occurrences is None else dict()
+    with measure(signal, "get_abbreviations_definition"):
+        dictoab2 = get_abbreviations_definition(clean_doc, matcher, threshold, occurrences=token_occurrences)
 
-    signal.emit(60)
+    emit_progress(signal, 60)
 
+    with measure(signal, "merge_abbreviations"):
+        dictoab2 = merge_abbreviations(dictoab2, dictoab1)
 
-    dictoab2 = select_best_match(dictoab2)
-    for abbr in dictoab1:
-        if abbr not in dictoab2:
-            dictoab2[abbr] = dictoab1[abbr]
+    if occurrences is not None:
+        add_occurrences(occurrences, dictoab2, doc, clean_doc, token_occurrences)
 
-    signal.emit(70)
+    emit_progress(signal, 70)
 
     return dictoab2
 
+
+# Function to add the offsets in the text of doc where each abbreviation occurs to occurrences: the token
+# positions in clean_doc found with its full forms are mapped back through the source offsets, and the
+# abbreviations only scispacy found take the occurrences its detector lists in doc.
+def add_occurrences(occurrences, abbreviations, doc, clean_doc, token_occurrences):
+    sources = clean_doc.user_data[SOURCE_OFFSETS]
+    scispacy_occurrences = dict()
+    for abrv in doc._.abbreviations:
+        scispacy_occurrences.setdefault(abrv["short_text"], set()).add(doc[abrv["short_start"]].idx)
+
+    for abbr in abbreviations:
+        if abbr in token_occurrences:
+            occurrences[abbr] = [sources[i] for i in token_occurrences[abbr]]
+        else:
+            occurrences[abbr] = sorted(scispacy_occurrences.get(abbr, ()))
+
 if __name__ == "__main__":
     abbrs = find_abbreviations(text)
     for i in abbrs:
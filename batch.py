@@ -0,0 +1,88 @@
+from concurrent.futures import ProcessPoolExecutor
+from docacronym_master import DocAcronymMaster
+from abbreviation_detector import emit_progress
+from result_cache import find_abbreviations_incremental
+from instrumentation import measure
+import model_registry
+import multiprocessing
+import os
+
+
+class QueueProgress:
+    """
+    Sends the progress of one document to a multiprocessing queue as (file, value).
+
+    Stands in for the Qt progress signal inside pool processes, where there is no Qt.
+    """
+
+    def __init__(self, queue, file):
+        self.queue = queue
+        self.file = file
+        self.progress = 0
+
+    def emit(self, value):
+        # Progress never goes backwards, whichever stage reports it
+        self.progress = max(self.progress, value)
+        self.queue.put((self.file, self.progress))
+
+
+# Function to return the path the updated copy of a document is written to
+def updated_document_path(file, folder=None):
+    fullpath, filename = os.path.split(file)
+    return os.path.join(folder or fullpath, f'{os.path.splitext(filename)[0]}-updated.docx')
+
+
+# Function to load the spaCy pipeline once when a pool process starts
+def init_worker(fast=False):
+    model_registry.warm_up(fast=fast)
+
+
+# Function to add the table of abbreviations to a loaded document and save the updated copy
+def save_updated_document(docMaster, abbreviations, file, folder=None, signal=None):
+    filepath = updated_document_path(file, folder)
+    with measure(signal, "update_document"):
+        docMaster.update_document(abbreviations, filepath)
+    with measure(signal, "saveDocument"):
+        try:
+            docMaster.saveDocument(filepath)
+        except PermissionError:
+            from utils import get_users_desktop_folder
+            filepath = updated_document_path(file, get_users_desktop_folder())
+            docMaster.saveDocument(filepath)
+    return filepath
+
+
+# Function to find the abbreviations of a document, add their table and save the updated copy.
+# Runs inside pool processes, so it only takes and returns picklable values.
+def process_document(file, queue=None, fast=False, folder=None):
+    progress = QueueProgress(queue, file) if queue is not None else None
+
+    docMaster = DocAcronymMaster(file)
+    emit_progress(progress, 10)
+
+    # get the paragraphs of the document, with its tables, text boxes, headers, footers and notes
+    paragraphs = [fragment.text for fragment in docMaster.iter_fragments()]
+    emit_progress(progress, 20)
+
+    # get the abbreviations in the text, re-parsing only the paragraphs that changed since the last run
+    abbreviations = find_abbreviations_incremental(paragraphs, progress, fast)
+    emit_progress(progress, 90)
+
+    # update the document with the table of abbreviations and write it straight away
+    filepath = save_updated_document(docMaster, abbreviations, file, folder)
+
+    emit_progress(progress, 100)
+
+    return filepath
+
+
+# Function to create a process pool whose processes each hold a warm spaCy pipeline.
+# The processes are spawned, not forked: a fork would copy the locks other threads hold at that moment,
+# like model_registry's while the GUI warms up the pipeline, and init_worker would wait on them forever.
+def create_pool(files_count, max_workers=None, fast=False):
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    # No point starting more processes than there are documents
+    max_workers = max(1, min(max_workers, files_count))
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=init_worker, initargs=(fast,))
@@ -0,0 +1,49 @@
+# Benchmark candidate expansion lookup: full document scan vs. the token index.
+# Run from the project folder so the bundled model is found:
+#     python benchmarks/bench_candidate_expansions.py --pages 1 10 100 300
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_registry
+from abbreviation_detector import (text, remove_symbol_tokens, get_abbreviations,
+                                   build_token_index, get_candidate_expansions)
+
+
+# Function to time the candidate expansions of every potential abbreviation in the document
+def time_candidates(doc, abbreviations, use_index):
+    start = time.perf_counter()
+    token_index = build_token_index(doc) if use_index else None
+    candidates = {abbreviation: get_candidate_expansions(abbreviation, doc, token_index)
+                  for abbreviation in abbreviations}
+    return time.perf_counter() - start, candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark candidate expansion lookup.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 300],
+                        help="document sizes to benchmark, in copies of the sample text")
+    args = parser.parse_args()
+
+    nlp = model_registry.get_nlp()
+    matcher = model_registry.get_matcher()
+
+    print(f"{'pages':>6} {'tokens':>9} {'abbrs':>6} {'scan (s)':>10} {'index (s)':>10} {'speedup':>8}")
+    for pages in args.pages:
+        # Only the tokenizer is needed to benchmark candidate generation
+        doc = remove_symbol_tokens(nlp.make_doc(text * pages), nlp.tokenizer)
+        abbreviations = get_abbreviations(doc, matcher)
+
+        scan_time, scan_candidates = time_candidates(doc, abbreviations, use_index=False)
+        index_time, index_candidates = time_candidates(doc, abbreviations, use_index=True)
+        assert scan_candidates == index_candidates
+
+        print(f"{pages:>6} {len(doc):>9} {len(abbreviations):>6} {scan_time:>10.3f} {index_time:>10.3f} "
+              f"{scan_time / index_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Benchmark fast detect mode against the full pipeline: throughput and recall.
+# Run from the project folder so the bundled model is found:
+#     python benchmarks/bench_fast_detect.py --pages 1 10 50
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_registry
+from abbreviation_detector import text, find_abbreviations
+
+
+# Function to time find_abbreviations on a text, with the model already loaded
+def time_detection(document, fast):
+    model_registry.warm_up(fast=fast)
+    start = time.perf_counter()
+    abbreviations = find_abbreviations(document, fast=fast)
+    return time.perf_counter() - start, abbreviations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fast detect mode against the full pipeline.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50],
+                        help="document sizes to benchmark, in copies of the sample text")
+    args = parser.parse_args()
+
+    # Model loading is timed separately from detection
+    for fast in (False, True):
+        start = time.perf_counter()
+        model_registry.warm_up(fast=fast)
+        mode = "fast" if fast else "full"
+        print(f"load {mode}: {time.perf_counter() - start:.2f}s, components: {model_registry.get_nlp(fast=fast).pipe_names}")
+
+    print(f"{'pages':>6} {'full (s)':>9} {'fast (s)':>9} {'speedup':>8} {'recall':>7}")
+    for pages in args.pages:
+        document = text * pages
+        full_time, full_abbreviations = time_detection(document, fast=False)
+        fast_time, fast_abbreviations = time_detection(document, fast=True)
+
+        # Recall of fast mode: share of the full pipeline's abbreviations found with the same definition
+        found = sum(1 for abbr, defn in full_abbreviations.items() if fast_abbreviations.get(abbr) == defn)
+        recall = found / len(full_abbreviations) if full_abbreviations else 1.0
+
+        print(f"{pages:>6} {full_time:>9.3f} {fast_time:>9.3f} {full_time / fast_time:>7.1f}x {recall:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
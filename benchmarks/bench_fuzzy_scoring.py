@@ -0,0 +1,94 @@
+# Benchmark fuzzy scoring in get_abbreviations_definition and select_best_match:
+# fuzzywuzzy one candidate at a time (if installed), rapidfuzz one at a time, and rapidfuzz batched.
+# Also checks that every variant finds the same abbreviations, on the sample text and on real documents
+# (document.docx by default), and reports how often the memo of full form checks was hit. The memo is
+# cleared before each variant so none starts warm.
+# The rapidfuzz and fuzzywuzzy ratios are not the same function (Indel distance against difflib's
+# SequenceMatcher when python-Levenshtein is not installed), so they can disagree on some documents.
+# Exits with status 1 if a variant finds different abbreviations.
+# Run from the project folder so the bundled model is found:
+#     python benchmarks/bench_fuzzy_scoring.py --pages 10 100 --docs document.docx path/to/corpus
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rapidfuzz import fuzz
+import model_registry
+import abbreviation_detector
+from abbreviation_detector import text, remove_symbol_tokens, get_abbreviations_definition, select_best_match
+from docacronym_master import DocAcronymMaster
+from cli import find_documents
+
+
+# Function to score candidates one call at a time with rapidfuzz
+def rapidfuzz_loop_scores(text, choices):
+    return [int(round(fuzz.ratio(text, choice))) for choice in choices]
+
+
+# Function to score candidates one call at a time with fuzzywuzzy, as the detector used to
+def fuzzywuzzy_loop_scores(text, choices):
+    from fuzzywuzzy import fuzz as fuzzywuzzy_fuzz
+    return [fuzzywuzzy_fuzz.ratio(text, choice) for choice in choices]
+
+
+# Function to time definition finding and best match selection with a given scoring function
+def time_scoring(doc, matcher, scores_function):
+    batched = abbreviation_detector.match_scores
+    abbreviation_detector.match_scores = scores_function
+    abbreviation_detector.full_form_cache.clear()
+    try:
+        start = time.perf_counter()
+        abbreviations = select_best_match(get_abbreviations_definition(doc, matcher, 80))
+        return time.perf_counter() - start, abbreviations
+    finally:
+        abbreviation_detector.match_scores = batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy scoring of candidate full forms.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100],
+                        help="document sizes to benchmark, in copies of the sample text")
+    parser.add_argument("--docs", nargs="*", default=["document.docx"],
+                        help="real .docx documents to check as well, as files, folders or glob patterns")
+    args = parser.parse_args()
+
+    variants = [("rapidfuzz loop", rapidfuzz_loop_scores), ("rapidfuzz batched", abbreviation_detector.match_scores)]
+    if importlib.util.find_spec("fuzzywuzzy") is not None:
+        variants.insert(0, ("fuzzywuzzy loop", fuzzywuzzy_loop_scores))
+    else:
+        print("fuzzywuzzy is not installed, comparing the rapidfuzz variants only")
+
+    nlp = model_registry.get_nlp()
+    matcher = model_registry.get_matcher()
+
+    cases = [(f"{pages} pages", text * pages) for pages in args.pages]
+    cases += [(path, DocAcronymMaster(path).get_text()) for path in find_documents(args.docs)]
+
+    failed = False
+    for case, case_text in cases:
+        # Only the tokenizer is needed to benchmark the scoring
+        doc = remove_symbol_tokens(nlp.make_doc(case_text), nlp.tokenizer)
+        print(f"{case}, {len(doc)} tokens")
+
+        reference = None
+        for name, scores_function in variants:
+            elapsed, abbreviations = time_scoring(doc, matcher, scores_function)
+            if reference is None:
+                reference_name, reference = name, abbreviations
+            info = abbreviation_detector.full_form_cache.info()
+            print(f"  {name:<18} {elapsed:>8.3f}s  {'same' if abbreviations == reference else 'DIFFERENT'}  "
+                  f"memo {info['hits']} hits / {info['misses']} misses")
+            for abbr in sorted(set(abbreviations) | set(reference)):
+                if abbreviations.get(abbr) != reference.get(abbr):
+                    failed = True
+                    print(f"    {abbr}: {reference_name} {reference.get(abbr)!r}, {name} {abbreviations.get(abbr)!r}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
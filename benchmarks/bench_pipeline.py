@@ -0,0 +1,154 @@
+# Benchmark every stage of the detection pipeline on generated documents of 1 to 1000 pages,
+# and optionally on real .docx documents, recording the timings to JSON for regression tracking.
+# A generated page is one copy of the sample text, written as a .docx with python-docx.
+# Run from the project folder so the bundled model is found:
+#     python benchmarks/bench_pipeline.py --pages 1 10 100 1000 --out bench_pipeline.json
+#     python benchmarks/bench_pipeline.py --docs path/to/corpus --baseline bench_pipeline.json
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+import spacy
+import model_registry
+import abbreviation_detector
+from docacronym_master import DocAcronymMaster
+from abbreviation_detector import (text, remove_symbol_tokens, scispacy_abbreviation_detector,
+                                   get_abbreviations_definition, select_best_match)
+from text_normalization import remove_symbols
+from cli import find_documents
+
+# Stages timed on every document, in pipeline order
+STAGES = ["get_text", "remove_symbols", "scispacy_abbreviation_detector", "nlp", "remove_symbol_tokens",
+          "get_abbreviations_definition", "select_best_match", "update_document", "saveDocument"]
+
+
+# Function to write a generated document of the given number of pages, one copy of the sample text per page
+def generate_document(pages, folder):
+    path = os.path.join(folder, f'generated-{pages}.docx')
+    document = docx.Document()
+    paragraphs = [paragraph for paragraph in text.split('\n') if paragraph.strip()]
+    for page in range(pages):
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+        if page < pages - 1:
+            document.add_page_break()
+    document.save(path)
+    return path
+
+
+# Function to time a call, returning its result and the elapsed seconds
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+# Function to run every stage once on a document, returning the seconds of each stage and the sizes seen
+def run_stages(path, nlp, matcher, folder):
+    times = {}
+    # Start without the full form checks memoized by earlier runs
+    abbreviation_detector.full_form_cache.clear()
+    docMaster = DocAcronymMaster(path)
+    document_text, times["get_text"] = timed(docMaster.get_text)
+
+    # Documents of more than a million characters need a larger limit than spaCy's default
+    nlp.max_length = max(nlp.max_length, len(document_text) + 1)
+
+    _, times["remove_symbols"] = timed(remove_symbols, document_text)
+    _, times["scispacy_abbreviation_detector"] = timed(scispacy_abbreviation_detector, document_text, nlp)
+    doc, times["nlp"] = timed(nlp, document_text)
+    tokens = len(doc)
+    doc, times["remove_symbol_tokens"] = timed(remove_symbol_tokens, doc, nlp.tokenizer)
+    full_forms, times["get_abbreviations_definition"] = timed(get_abbreviations_definition, doc, matcher, 80)
+    abbreviations, times["select_best_match"] = timed(select_best_match, full_forms)
+
+    updated_path = os.path.join(folder, f'{os.path.splitext(os.path.basename(path))[0]}-updated.docx')
+    _, times["update_document"] = timed(docMaster.update_document, abbreviations, updated_path)
+    _, times["saveDocument"] = timed(docMaster.saveDocument, updated_path)
+
+    sizes = {"chars": len(document_text), "tokens": tokens, "abbreviations": len(abbreviations)}
+    return times, sizes
+
+
+# Function to benchmark a document, keeping the fastest time of each stage over the repeats
+def benchmark_document(name, path, nlp, matcher, folder, repeat, pages=None):
+    best = {}
+    for _ in range(repeat):
+        times, sizes = run_stages(path, nlp, matcher, folder)
+        for stage, seconds in times.items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+    return {"document": name, "pages": pages, **sizes, "total": sum(best.values()), "stages": best}
+
+
+# Function to print a result, with the change against the same document of a baseline run if there is one
+def print_result(result, baseline):
+    previous = baseline.get(result["document"], {}).get("stages", {})
+    print(f"{result['document']}: {result['chars']} chars, {result['tokens']} tokens, "
+          f"{result['abbreviations']} abbreviations, {result['total']:.3f}s")
+    for stage in STAGES:
+        seconds = result["stages"][stage]
+        change = f"  {seconds / previous[stage] - 1:+.1%}" if previous.get(stage) else ""
+        print(f"  {stage:<30} {seconds:>9.4f}s{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the detection pipeline.")
+    parser.add_argument("--pages", type=int, nargs="*", default=[1, 10, 100],
+                        help="generated document sizes to benchmark, in copies of the sample text")
+    parser.add_argument("--docs", nargs="*", default=[],
+                        help="real .docx documents to benchmark, as files, folders or glob patterns")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per document, the fastest is kept")
+    parser.add_argument("--out", help="JSON file the results are written to")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = {result["document"]: result for result in json.load(f)["results"]}
+
+    # Loading the model is timed once, through the registry the pipeline uses, and the other stages reuse it.
+    # Nothing should have loaded it yet, but unloading makes sure the load is timed.
+    model_registry.unload()
+    nlp, load_time = timed(model_registry.get_nlp)
+    print(f"load_model: {load_time:.2f}s")
+    matcher = model_registry.get_matcher()
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for pages in args.pages:
+            path = generate_document(pages, folder)
+            result = benchmark_document(f"generated-{pages}", path, nlp, matcher, folder, args.repeat, pages)
+            print_result(result, baseline)
+            results.append(result)
+
+        for path in find_documents(args.docs):
+            result = benchmark_document(os.path.basename(path), path, nlp, matcher, folder, args.repeat)
+            print_result(result, baseline)
+            results.append(result)
+
+    if args.out:
+        report = {
+            "created": datetime.datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "spacy": spacy.__version__,
+            "model": model_registry.DEFAULT_MODEL,
+            "repeat": args.repeat,
+            "load_model": load_time,
+            "results": results,
+        }
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
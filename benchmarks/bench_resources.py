@@ -0,0 +1,71 @@
+# Benchmark loading the Qt resources: the module generated by pyrcc5, with every image embedded as
+# a byte literal, against resources_rc.py registering the binary resources.rcc built by build_resources.py.
+# Each run starts a fresh interpreter, imports the resources and draws the largest image.
+# "cold" runs import without a cached .pyc, "cached" runs reuse it.
+# Run from the project folder after python build_resources.py:
+#     python benchmarks/bench_resources.py --runs 5
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Script run by each child interpreter, it prints the seconds to import the resources and to draw an image
+CHILD = '''
+import sys, time
+sys.path.insert(0, {folder!r})
+from PyQt5 import QtGui
+app = QtGui.QGuiApplication(sys.argv)
+start = time.perf_counter()
+import resources_rc
+imported = time.perf_counter()
+assert not QtGui.QImage(":/images/images/background.jpeg").isNull()
+print(imported - start, time.perf_counter() - imported)
+'''
+
+
+# Function to time one run of the resources found in a folder
+def time_run(folder, cached, env):
+    code = CHILD.format(folder=folder)
+    # -B stops Python from reading or writing .pyc files for this run
+    command = [sys.executable, "-c", code] if cached else [sys.executable, "-B", "-c", code]
+    if not cached:
+        env = dict(env, PYTHONDONTWRITEBYTECODE="1", PYTHONPYCACHEPREFIX=tempfile.mkdtemp())
+    output = subprocess.run(command, cwd=folder, env=env, capture_output=True, text=True, check=True).stdout
+    return [float(value) for value in output.split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generated resource module against resources.rcc.")
+    parser.add_argument("--runs", type=int, default=5, help="runs per variant")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # Without a display the image is drawn offscreen
+    if sys.platform != "win32" and not env.get("DISPLAY") and not env.get("WAYLAND_DISPLAY"):
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    with tempfile.TemporaryDirectory() as generated:
+        # The generated module, as it used to be checked in
+        subprocess.run([sys.executable, "-m", "PyQt5.pyrcc_main", os.path.join(ROOT, "resources.qrc"),
+                        "-o", os.path.join(generated, "resources_rc.py")], cwd=ROOT, check=True)
+        variants = {"generated module": (generated, os.path.join(generated, "resources_rc.py")),
+                    "rcc file": (ROOT, os.path.join(ROOT, "resources.rcc"))}
+
+        print(f"{'variant':<17} {'size (KB)':>10} {'':<7} {'import (s)':>11} {'first image (s)':>16}")
+        for name, (folder, path) in variants.items():
+            size = os.path.getsize(path) // 1024
+            for cached in (False, True):
+                # Write the .pyc of the cached runs before timing them
+                time_run(folder, cached, env)
+                runs = [time_run(folder, cached, env) for _ in range(args.runs)]
+                imports = statistics.median(run[0] for run in runs)
+                images = statistics.median(run[1] for run in runs)
+                print(f"{name:<17} {size:>10} {'cached' if cached else 'cold':<7} {imports:>11.4f} {images:>16.4f}")
+
+
+if __name__ == "__main__":
+    main()
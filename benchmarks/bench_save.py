@@ -0,0 +1,80 @@
+# Benchmark saving an updated document: python-docx writing every part of the package, against
+# DocAcronymMaster.saveDocument copying the file and writing only word/document.xml again.
+# The generated documents hold incompressible images, like scanned pages or photos in proposals,
+# and a paragraph of text. Peak memory is traced Python memory only.
+# Run from the project folder:
+#     python benchmarks/bench_save.py --images 10 100 --image-size 1
+import argparse
+import io
+import os
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.shared import Inches
+from docacronym_master import DocAcronymMaster
+
+# Paragraph written before each image
+PARAGRAPH = "The proposal uses Natural Language Processing (NLP) to read the scanned pages."
+
+
+# Function to make a PNG of random pixels, which does not compress, of about size bytes
+def make_image(size):
+    width = 1024
+    height = max(1, size // (width * 3))
+    rows = b''.join(b'\x00' + os.urandom(width * 3) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows, 0)) + chunk(b'IEND', b'')
+
+
+# Function to write a document with a number of images of a given size in MB, returning its path
+def generate_document(images, image_size, folder):
+    document = Document()
+    for _ in range(images):
+        document.add_paragraph(PARAGRAPH)
+        # Each image is a part of its own
+        document.add_picture(io.BytesIO(make_image(int(image_size * 2 ** 20))), width=Inches(2))
+    path = os.path.join(folder, f"images-{images}.docx")
+    document.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark saving a document in full against the fast save.")
+    parser.add_argument("--images", type=int, nargs="+", default=[10, 100], help="images per generated document")
+    parser.add_argument("--image-size", type=float, default=1, help="size of each image in MB")
+    args = parser.parse_args()
+
+    print(f"{'document':<18} {'size (MB)':>10} {'save':<5} {'time (s)':>9} {'peak (MB)':>10} {'valid':>6}")
+    with tempfile.TemporaryDirectory() as folder:
+        for images in args.images:
+            path = generate_document(images, args.image_size, folder)
+            docMaster = DocAcronymMaster(path)
+            docMaster.update_document({"BM": "Benchmark"}, None)
+            for name, fast in (("full", False), ("fast", True)):
+                target = os.path.join(folder, f"images-{images}-{name}.docx")
+                tracemalloc.start()
+                start = time.perf_counter()
+                docMaster.saveDocument(target, fast=fast)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                with zipfile.ZipFile(target) as package:
+                    valid = package.testzip() is None
+                print(f"{os.path.basename(path):<18} {os.path.getsize(path) / 2 ** 20:>10.1f} {name:<5} "
+                      f"{elapsed:>9.3f} {peak / 2 ** 20:>10.1f} {str(valid):>6}")
+
+
+if __name__ == "__main__":
+    main()
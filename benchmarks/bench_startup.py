@@ -0,0 +1,71 @@
+# Benchmark the time from launching the application to its first window being shown.
+# Each run starts a fresh interpreter, creates the main window and stops once it has been shown.
+# "eager" imports the detection modules before the window like the application used to,
+# "lazy" leaves them to the background warm-up as the application does now.
+# Run from the project folder:
+#     python benchmarks/bench_startup.py --runs 5
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Script run by each child interpreter, {preload} is replaced by the imports of the variant
+CHILD = '''
+import sys
+sys.path.insert(0, {root!r})
+{preload}
+from PyQt5 import QtWidgets
+import main
+app = QtWidgets.QApplication(sys.argv)
+window = main.MyMainWindow()
+window.show()
+app.processEvents()
+print("shown", flush=True)
+'''
+
+VARIANTS = {
+    "eager": "import docacronym_master, result_cache, batch",
+    "lazy": "",
+}
+
+
+# Function to time one launch of a variant, until the child reports its window as shown
+def time_launch(preload, env):
+    code = CHILD.format(root=ROOT, preload=preload)
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    line = child.stdout.readline()
+    elapsed = time.perf_counter() - start
+    child.wait()
+    if line.strip() != "shown":
+        raise RuntimeError("the window was not shown, run the child script by hand to see why")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the time to the first window of the application.")
+    parser.add_argument("--runs", type=int, default=5, help="launches per variant")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # Without a display the window is drawn offscreen
+    if sys.platform != "win32" and not env.get("DISPLAY") and not env.get("WAYLAND_DISPLAY"):
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    # The first launch also compiles the modules, so it is left out
+    for preload in VARIANTS.values():
+        time_launch(preload, env)
+
+    print(f"{'variant':<8} {'median (s)':>11} {'min (s)':>8}")
+    for name, preload in VARIANTS.items():
+        times = [time_launch(preload, env) for _ in range(args.runs)]
+        print(f"{name:<8} {statistics.median(times):>11.3f} {min(times):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Benchmark inserting the table of abbreviations: python-docx adding and styling the rows one cell at a time,
+# as update_document used to, against update_document building the table from table_template's pre-built rows.
+# Also checks that both write exactly the same document body.
+# Run from the project folder:
+#     python benchmarks/bench_table.py --rows 50 500 5000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lxml import etree
+from docx.enum.text import WD_BREAK
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.shared import Pt, Inches, RGBColor
+from docacronym_master import DocAcronymMaster
+from bench_pipeline import generate_document
+
+
+# Function to insert the table with python-docx calls for every row and cell, as update_document used to
+def per_cell_update(docMaster, abbreviations):
+    doc = docMaster.doc
+    if len(doc.paragraphs):
+        doc.add_page_break()
+    paragraph = doc.paragraphs[1]._insert_paragraph_before()
+    paragraph.add_run().add_break(WD_BREAK.PAGE)
+    paragraph.add_run('List of Abbreviations').font.color.rgb = RGBColor(173, 216, 230)
+
+    table = doc.add_table(rows=1, cols=2)
+    paragraph._p.addnext(table._tbl)
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = 'Abbreviation'
+    hdr_cells[1].text = 'Definition'
+    for cell in table.rows[0].cells:
+        cell.paragraphs[0].add_run().font.bold = True
+        shading_elm = parse_xml(r'<w:shd xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" w:fill="590B0B"/>')
+        cell._tc.get_or_add_tcPr().append(shading_elm)
+    table.style = 'Table Grid'
+    for row in table.rows:
+        row.height = Pt(12)
+
+    for abbr, defn in abbreviations.items():
+        row_cells = table.add_row().cells
+        row_cells[0].text = abbr
+        row_cells[1].text = defn
+        row_cells[0]._element.get_or_add_tcPr().get_or_add_tcW().attrib[qn('w:w')] = '2000'
+        row_cells[1]._element.get_or_add_tcPr().get_or_add_tcW().attrib[qn('w:w')] = '4000'
+
+    for row in table.rows:
+        for idx, width in enumerate((Inches(0.1), Inches(2))):
+            row.cells[idx].width = width
+
+
+# Function to insert the table with update_document
+def template_update(docMaster, abbreviations):
+    docMaster.update_document(abbreviations, None)
+
+
+VARIANTS = [("per cell", per_cell_update), ("template", template_update)]
+
+
+# Function to make a dictionary of abbreviations of a given size
+def make_abbreviations(rows):
+    return {f"AB{index}": f"Abbreviation number {index} & its <definition>" for index in range(rows)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark building the table of abbreviations.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 500, 5000], help="table sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per variant, the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} {'variant':<9} {'time (s)':>9} {'same':>5}")
+    with tempfile.TemporaryDirectory() as folder:
+        path = generate_document(1, folder)
+        for rows in args.rows:
+            abbreviations = make_abbreviations(rows)
+            reference = None
+            for name, update in VARIANTS:
+                times = []
+                for _ in range(args.repeat):
+                    docMaster = DocAcronymMaster(path)
+                    start = time.perf_counter()
+                    update(docMaster, abbreviations)
+                    times.append(time.perf_counter() - start)
+                body = etree.tostring(docMaster.doc.element.body, method="c14n")
+                if reference is None:
+                    reference = body
+                print(f"{rows:>6} {name:<9} {min(times):>9.3f} {str(body == reference):>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Benchmark extracting the text of a document: DocAcronymMaster.get_text, which loads python-docx's
+# object model, against document_text.get_document_text, which streams word/document.xml.
+# Also checks that both give exactly the same text. Peak memory is traced Python memory only;
+# libxml2 allocates the parsed XML of both extractors outside of it.
+# The full content extractors (tables, text boxes, headers, footers, notes) are timed as well, on the loaded
+# document like the application does, and streamed like the command line does without --update.
+# Give real documents with --docs to time them too, since generated ones only have body paragraphs.
+# Run from the project folder:
+#     python benchmarks/bench_text_extraction.py --pages 10 100 1000
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docacronym_master import DocAcronymMaster
+from document_text import get_document_text, iter_document_fragments
+from bench_pipeline import generate_document
+from cli import find_documents
+
+
+# Function to extract the text with python-docx, as the application does
+def python_docx_text(path):
+    return DocAcronymMaster(path).get_text()
+
+
+# Function to extract the full content of a loaded document, as the application does
+def loaded_fragments_text(path):
+    return ' '.join(fragment.text for fragment in DocAcronymMaster(path).iter_fragments())
+
+
+# Function to extract the full content by streaming the parts of the document
+def streamed_fragments_text(path):
+    return ' '.join(fragment.text for fragment in iter_document_fragments(path))
+
+
+# Extractors compared, the first one is the reference the others are checked against
+EXTRACTORS = [("python-docx", python_docx_text), ("streaming", get_document_text),
+              ("full, loaded", loaded_fragments_text), ("full, streamed", streamed_fragments_text)]
+
+
+# Function to time an extractor and trace its peak memory
+def measure(extract, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = extract(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark python-docx text extraction against streaming.")
+    parser.add_argument("--pages", type=int, nargs="*", default=[10, 100, 1000],
+                        help="generated document sizes to benchmark, in copies of the sample text")
+    parser.add_argument("--docs", nargs="*", default=[],
+                        help="real .docx documents to benchmark, as files, folders or glob patterns")
+    args = parser.parse_args()
+
+    print(f"{'document':<24} {'extractor':<15} {'time (s)':>9} {'peak (MB)':>10} {'chars':>9} {'same':>5}")
+    with tempfile.TemporaryDirectory() as folder:
+        documents = [generate_document(pages, folder) for pages in args.pages] + find_documents(args.docs)
+        for path in documents:
+            reference = None
+            for name, extract in EXTRACTORS:
+                elapsed, peak, text = measure(extract, path)
+                if reference is None:
+                    reference = text
+                # The full content extractors find more text, so only the streamed body text must be the same
+                same = str(text == reference) if name == "streaming" else ""
+                print(f"{os.path.basename(path):<24} {name:<15} {elapsed:>9.3f} {peak / 2 ** 20:>10.1f} "
+                      f"{len(text):>9} {same:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Micro-benchmark of text_normalization against the str.replace loops and per-call regexes the detectors used:
+# removing the symbols from a whole text (with and without non-ASCII characters), from every word of it,
+# cleaning abbreviations and replicating their last letter. Also checks that both give the same results.
+# Then times building a NormalizedText, which also keeps the offsets back to the paragraphs,
+# against remove_symbols alone, with the memory its offset arrays take.
+# Run from the project folder:
+#     python benchmarks/bench_text_normalization.py --pages 10 100
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import text_normalization
+from abbreviation_detector import text
+
+ABBREVIATIONS = ["NASA", "R&D", "A/B", "SCA-L", "NLP", "C4ISR", "AT&T", "F16", "B2B", "IEEE"]
+
+
+# The symbols removal the detectors used, one str.replace per symbol
+def replace_symbols(text, symbols=text_normalization.SYMBOLS):
+    for symbol in symbols:
+        text = text.replace(symbol, "")
+    return text
+
+
+# The abbreviation cleaning the detectors used
+def replace_clean_abbreviation(abbreviation):
+    for i in ['@', '&', "/", "\\"]:
+        abbreviation = abbreviation.replace(i, "")
+    return abbreviation
+
+
+# The last letter replication the detectors used, with the pattern looked up on each call
+def search_replicate_last_char(input_str):
+    match = re.search(r"([a-zA-Z])(\d+)$", input_str)
+    if match:
+        items = match.groups()
+        return input_str[:-len(items[1])] + items[0] * (int(items[1]) - 1)
+
+
+# Function to time the old and new function of a case on a list of inputs, returning the best of a few runs
+def compare(old, new, inputs, repeat=5):
+    results = [[old(value) for value in inputs], [new(value) for value in inputs]]
+    times = [min(timeit.repeat(lambda: [function(value) for value in inputs], number=1, repeat=repeat))
+             for function in (old, new)]
+    return times, results[0] == results[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the text normalization helpers.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100],
+                        help="text sizes to benchmark, in copies of the sample text")
+    args = parser.parse_args()
+
+    print(f"{'case':<28} {'pages':>6} {'old (s)':>9} {'new (s)':>9} {'speedup':>8} {'same':>5}")
+    for pages in args.pages:
+        document = text * pages
+        words = document.split()
+        cases = [
+            ("remove_symbols", replace_symbols, text_normalization.remove_symbols, [document]),
+            ("remove_symbols, ASCII", replace_symbols, text_normalization.remove_symbols,
+             [document.encode("ascii", "ignore").decode()]),
+            ("remove_word_symbols", replace_symbols, text_normalization.remove_word_symbols, words),
+            ("clean_abbreviation", replace_clean_abbreviation, text_normalization.clean_abbreviation,
+             ABBREVIATIONS * pages * 10),
+            ("replicate_last_char", search_replicate_last_char, text_normalization.replicate_last_char,
+             ABBREVIATIONS * pages * 10),
+        ]
+        for name, old, new, inputs in cases:
+            (old_time, new_time), same = compare(old, new, inputs)
+            print(f"{name:<28} {pages:>6} {old_time:>9.4f} {new_time:>9.4f} {old_time / new_time:>7.1f}x {str(same):>5}")
+
+    print(f"\n{'pages':>6} {'remove (s)':>11} {'with offsets (s)':>17} {'chars':>9} {'removals':>9} {'map (KB)':>9}")
+    for pages in args.pages:
+        paragraphs = [paragraph for paragraph in text.split('\n') if paragraph.strip()] * pages
+        remove_time = min(timeit.repeat(lambda: text_normalization.remove_symbols(' '.join(paragraphs)),
+                                        number=1, repeat=5))
+        offsets_time = min(timeit.repeat(lambda: text_normalization.NormalizedText(paragraphs), number=1, repeat=5))
+        normalized = text_normalization.NormalizedText(paragraphs)
+        arrays = [normalized.starts, normalized.offsets.breakpoints, normalized.offsets.shifts]
+        size = sum(len(values) * values.itemsize for values in arrays)
+        print(f"{pages:>6} {remove_time:>11.4f} {offsets_time:>17.4f} {len(normalized.text):>9} "
+              f"{len(normalized.offsets.breakpoints):>9} {size / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
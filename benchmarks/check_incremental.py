@@ -0,0 +1,70 @@
+# Check that find_abbreviations_incremental gives the same abbreviations as find_abbreviations
+# when the document is edited between runs, with a fresh cache:
+# - a definition changed while the abbreviation is also used in unchanged paragraphs before and after it
+# - a paragraph of a document of repeated pages changed, so several copies of each definition exist
+# Exits with status 1 if a result differs.
+# Run from the project folder so the bundled model is found:
+#     python benchmarks/check_incremental.py --pages 20
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from abbreviation_detector import text, find_abbreviations
+from result_cache import ResultCache, find_abbreviations_incremental
+
+# Paragraphs between the definition and the other uses of the abbreviation, so they are parsed on their own
+FILLER = ["This paragraph talks about other matters entirely and has many plain words in it for padding. " * 3] * 8
+
+
+# Function to make a document defining XYZ with a first word, with XYZ used before and after the definition
+def definition_document(word):
+    return (["Earlier the XYZ was measured by the team."] + FILLER +
+            [f"We measured the {word} and very good Yield Zonal (XYZ) in the field."] + FILLER +
+            ["Later the XYZ was measured again by the team."])
+
+
+# Function to make the versions of a document of repeated pages, the second with one paragraph edited
+def repeated_documents(pages):
+    paragraphs = [paragraph for paragraph in text.split('\n') if paragraph.strip()] * pages
+    edited = list(paragraphs)
+    edited[len(edited) // 2] += " The Risk Management Framework (RMF) and Zebra Xylophone Quartet (ZXQ)."
+    return paragraphs, edited
+
+
+# Function to run the incremental detection on each version of a document in turn, returning the
+# abbreviations that differ from a full run on the last version that differed, if any
+def check(versions, cache):
+    for paragraphs in versions:
+        incremental = find_abbreviations_incremental(paragraphs, cache=cache)
+        full = find_abbreviations(' '.join(paragraphs))
+        differences = {abbr: (incremental.get(abbr), full.get(abbr))
+                       for abbr in set(incremental) | set(full) if incremental.get(abbr) != full.get(abbr)}
+        if differences:
+            return differences
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the incremental detection against a full run.")
+    parser.add_argument("--pages", type=int, default=20, help="copies of the sample text in the repeated document")
+    args = parser.parse_args()
+
+    cases = [("edited definition", [definition_document("xeric"), definition_document("xenon")]),
+             ("repeated pages", repeated_documents(args.pages))]
+    failed = False
+    with tempfile.TemporaryDirectory() as folder:
+        for name, versions in cases:
+            cache = ResultCache(os.path.join(folder, f"{name}.sqlite3"))
+            differences = check(versions, cache)
+            failed = failed or bool(differences)
+            print(f"{name:<20} {'differs' if differences else 'same'}")
+            for abbr, (incremental, full) in sorted(differences.items()):
+                print(f"    {abbr}: incremental {incremental!r}, full {full!r}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Compiles resources.qrc into resources.rcc, the binary Qt resource file registered by resources_rc.py.
+# Run it again after changing resources.qrc or the images it lists:
+#     python build_resources.py
+import ast
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Format version of the resource tree written, the one Qt 5.8 and later read (it adds modification times)
+RCC_VERSION = 2
+
+
+# Function to compile a .qrc file with pyrcc5, returning the (data, names, tree) byte strings it generates
+def compile_resources(qrc):
+    with tempfile.TemporaryDirectory() as folder:
+        generated = os.path.join(folder, 'resources_rc.py')
+        subprocess.run([sys.executable, '-m', 'PyQt5.pyrcc_main', qrc, '-o', generated], cwd=ROOT, check=True)
+        with open(generated, encoding='utf-8') as f:
+            module = ast.parse(f.read())
+
+    # Read the byte strings without running the generated module, which would register them
+    arrays = {}
+    for node in module.body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            if node.targets[0].id.startswith('qt_resource_'):
+                arrays[node.targets[0].id] = ast.literal_eval(node.value)
+
+    return arrays['qt_resource_data'], arrays['qt_resource_name'], arrays[f'qt_resource_struct_v{RCC_VERSION}']
+
+
+# Function to write the compiled resources in the binary .rcc layout read by QResource.registerResource:
+# the "qres" magic, the format version, the offsets of the tree, data and names, then the three blocks
+def write_rcc(path, data, names, tree):
+    header_size = 4 + 4 * 4
+    data_offset = header_size
+    names_offset = data_offset + len(data)
+    tree_offset = names_offset + len(names)
+    with open(path, 'wb') as f:
+        f.write(b'qres')
+        f.write(struct.pack('>IIII', RCC_VERSION, tree_offset, data_offset, names_offset))
+        f.write(data)
+        f.write(names)
+        f.write(tree)
+
+
+def main():
+    qrc = os.path.join(ROOT, 'resources.qrc')
+    rcc = os.path.join(ROOT, 'resources.rcc')
+    write_rcc(rcc, *compile_resources(qrc))
+    print(f"Wrote {rcc} ({os.path.getsize(rcc)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
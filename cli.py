@@ -0,0 +1,182 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from docacronym_master import DocAcronymMaster
+from document_text import iter_document_paragraphs, iter_document_fragments
+from abbreviation_detector import find_abbreviations, find_abbreviations_stream
+from result_cache import find_abbreviations_incremental
+from instrumentation import PipelineMonitor, measure, report_path
+import batch
+
+
+# Function to expand the directories and glob patterns given on the command line to .docx files
+def find_documents(paths):
+    documents = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, '**', '*.docx'), recursive=True)
+        else:
+            matches = glob.glob(path, recursive=True)
+
+        for match in sorted(matches):
+            name = os.path.basename(match)
+            # Skip Word lock files and the copies this tool writes
+            if name.startswith('~$') or name.endswith('-updated.docx'):
+                continue
+            if match not in documents:
+                documents.append(match)
+    return documents
+
+
+# Function to run one document, returning its abbreviations and the updated copy's path (if written).
+# When a report folder is given, the performance report of the document is written to it.
+# Tables, text boxes, headers, footers and notes are read too, unless body_only is set.
+def run_document(file, fast, update, folder, stream=False, cache=True, report=None, profile=False, body_only=False):
+    monitor = PipelineMonitor(profile=profile) if report else None
+    try:
+        if update:
+            with measure(monitor, "load_document"):
+                docMaster = DocAcronymMaster(file)
+            if body_only:
+                paragraphs = docMaster.iter_paragraphs()
+            else:
+                paragraphs = (fragment.text for fragment in docMaster.iter_fragments())
+        else:
+            # Only the text is needed, so the XML parts are streamed instead of loading python-docx's object model
+            docMaster = None
+            if body_only:
+                paragraphs = iter_document_paragraphs(file)
+            else:
+                paragraphs = (fragment.text for fragment in iter_document_fragments(file))
+
+        if stream:
+            # Feed the paragraphs in chunks to bound memory on very large documents
+            mode = "stream"
+            abbreviations = find_abbreviations_stream(paragraphs, monitor, fast)
+        elif cache:
+            # Only the paragraphs that changed since the last run are parsed again
+            mode = "incremental"
+            with measure(monitor, "get_paragraphs"):
+                paragraphs = list(paragraphs)
+            abbreviations = find_abbreviations_incremental(paragraphs, monitor, fast)
+        else:
+            mode = "full"
+            with measure(monitor, "get_text"):
+                text = ' '.join(paragraphs)
+            abbreviations = find_abbreviations(text, monitor, fast)
+        filepath = batch.save_updated_document(docMaster, abbreviations, file, folder, monitor) if update else None
+
+        if monitor is not None:
+            os.makedirs(report, exist_ok=True)
+            monitor.dump(report_path(file, report), document=file, mode=mode, fast=fast,
+                         abbreviations=len(abbreviations))
+    finally:
+        if monitor is not None:
+            monitor.stop()
+    return abbreviations, filepath
+
+
+# Function to run the documents in this process, yielding (file, result, error) as they finish
+def run_serial(documents, fast, update, folder, stream, cache, report, profile, body_only):
+    # The pipeline is loaded on the first document that is not cached
+    for file in documents:
+        try:
+            yield file, run_document(file, fast, update, folder, stream, cache, report, profile, body_only), None
+        except Exception as e:
+            yield file, None, e
+
+
+# Function to run the documents in a process pool, yielding (file, result, error) as they finish
+def run_parallel(documents, jobs, fast, update, folder, stream, cache, report, profile, body_only):
+    with batch.create_pool(len(documents), jobs, fast) as pool:
+        futures = {pool.submit(run_document, file, fast, update, folder, stream, cache, report, profile,
+                               body_only): file
+                   for file in documents}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def extract(args):
+    documents = find_documents(args.paths)
+    if not documents:
+        print("No .docx documents found", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    if args.jobs > 1:
+        results = run_parallel(documents, args.jobs, args.fast, args.update, args.update_dir, args.stream, args.cache,
+                               args.report, args.profile, args.body_only)
+    else:
+        results = run_serial(documents, args.fast, args.update, args.update_dir, args.stream, args.cache,
+                             args.report, args.profile, args.body_only)
+
+    abbreviations = {}
+    failed = 0
+    for count, (file, result, error) in enumerate(results, 1):
+        if error is not None:
+            failed += 1
+            print(f"[{count}/{len(documents)}] {file}: failed: {error}", file=sys.stderr)
+            continue
+
+        abbreviations[file], filepath = result
+        saved = f", saved as {filepath}" if filepath else ""
+        print(f"[{count}/{len(documents)}] {file}: {len(abbreviations[file])} abbreviations{saved}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(documents)} documents in {elapsed:.1f}s ({len(documents) / elapsed:.2f} docs/sec), "
+          f"{failed} failed", file=sys.stderr)
+
+    # Keep the output in the order the documents were found
+    output = {file: abbreviations[file] for file in documents if file in abbreviations}
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+    else:
+        json.dump(output, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="acronym-master",
+                                     description="Find acronyms and their definitions in Word documents.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extract_parser = subparsers.add_parser("extract", help="extract the acronyms of many documents")
+    extract_parser.add_argument("paths", nargs="+", help="directories (searched recursively) or glob patterns of .docx files")
+    extract_parser.add_argument("--jobs", "-j", type=int, default=1, help="number of worker processes (default: 1)")
+    extract_parser.add_argument("--out", "-o", help="JSON file to write the acronyms to (default: stdout)")
+    extract_parser.add_argument("--fast", action="store_true", help="load only the spaCy components detection needs")
+    extract_parser.add_argument("--stream", action="store_true",
+                                help="process the paragraphs in chunks to bound memory on very large documents")
+    extract_parser.add_argument("--no-cache", dest="cache", action="store_false",
+                                help="always run detection instead of reusing cached results of unchanged documents and paragraphs")
+    extract_parser.add_argument("--body-only", action="store_true",
+                                help="only read the body paragraphs, not the tables, text boxes, headers, footers and notes")
+    extract_parser.add_argument("--update", action="store_true",
+                                help="also write a -updated.docx copy of each document with the table of acronyms")
+    extract_parser.add_argument("--update-dir", help="folder for the -updated.docx copies (default: next to each document)")
+    extract_parser.add_argument("--report", help="folder to write a JSON performance report of each document to "
+                                                 "(stage timings, CPU time and peak memory)")
+    extract_parser.add_argument("--profile", action="store_true", help="also run each document under cProfile "
+                                                                       "(needs --report)")
+    extract_parser.set_defaults(func=extract)
+
+    args = parser.parse_args(argv)
+    if args.profile and not args.report:
+        parser.error("--profile needs --report")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
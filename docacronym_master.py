@@ -1,9 +1,17 @@
-from docx.oxml import parse_xml
 from docx import Document
-from docx.shared import Pt
-from docx.oxml.ns import qn
-from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK
-from docx.shared import RGBColor, Inches
+from docx.enum.text import WD_BREAK
+from docx.shared import RGBColor, Emu
+from docx.enum.style import WD_STYLE_TYPE
+from document_text import (iter_loaded_document_fragments, get_loaded_fragment_paragraph, get_loaded_part_paragraphs,
+                           locate_run)
+from text_normalization import NormalizedText
+from table_template import abbreviations_table
+from package_writer import save_main_part, PackageNotCopied
+import tempfile
+import os
+
+# Size up to which a saved document is kept in memory, larger ones spill to a temporary file
+SPOOL_SIZE = 32 * 2 ** 20
 
 class DocAcronymMaster:
     """
@@ -20,8 +28,27 @@ class DocAcronymMaster:
     get_text()
         Returns the text from the Word document as a string.
 
+    iter_paragraphs()
+        Yields the text of each paragraph of the Word document.
+
+    iter_fragments()
+        Yields every paragraph of text of the Word document with its position,
+        including tables, text boxes, headers, footers and notes.
+
+    get_normalized_text()
+        Returns the fragments and their text with the symbols removed, mapped back to them.
+
+    locate_run(fragment, offset)
+        Finds the run holding a character of a fragment.
+
+    locate_abbreviations(occurrences, fragments, normalized)
+        Finds the fragments and runs where abbreviations found in the fragments occur.
+
     update_document(abbreviations: dict)
         Inserts a table of acronyms and their meanings into the document.
+
+    save_to_buffer()
+        Saves the document into a buffer to be written out later.
     """
 
     def __init__(self, doc_path):
@@ -34,6 +61,9 @@ class DocAcronymMaster:
             The path to the Word document.
         """
         self.doc = Document(doc_path)
+        # The file the document was loaded from and its state then, for saving by copying it
+        self.source = doc_path if isinstance(doc_path, (str, os.PathLike)) else None
+        self.source_state = DocAcronymMaster.get_file_state(self.source)
 
     def get_text(self):
         """
@@ -41,22 +71,78 @@ class DocAcronymMaster:
         """
         return ' '.join([p.text for p in self.doc.paragraphs])
 
+    def iter_paragraphs(self):
+        """
+        Yields the text of each paragraph of the Word document in order,
+        for streaming detection that does not build the whole text at once.
+        """
+        for p in self.doc.paragraphs:
+            yield p.text
+
+    def iter_fragments(self):
+        """
+        Yields a document_text.Fragment for every paragraph of text of the Word document:
+        the body with its tables and text boxes, then the headers, footers, footnotes and endnotes.
+        """
+        return iter_loaded_document_fragments(self.doc)
+
+    def get_normalized_text(self):
+        """
+        Returns the fragments of the Word document (see iter_fragments) and a
+        text_normalization.NormalizedText of their text, with the symbols removed like
+        the detectors remove them. The paragraph of the positions it locates is an index
+        in the fragments, so detections can be found in the document without searching it.
+        """
+        fragments = list(self.iter_fragments())
+        return fragments, NormalizedText([fragment.text for fragment in fragments])
+
+    def locate_run(self, fragment, offset):
+        """
+        Finds the run holding the character at offset of the text of a fragment.
+
+        Returns the run element, its index among the runs of the paragraph
+        (see document_text.iter_content_runs) and the offset in the text of the run,
+        or None if the offset is past the text of the fragment.
+        """
+        return locate_run(get_loaded_fragment_paragraph(self.doc, fragment), offset)
+
+    def locate_abbreviations(self, occurrences, fragments, normalized):
+        """
+        Finds where abbreviations found in the text of the fragments occur in the document.
+
+        Parameters:
+        -----------
+        occurrences : dict
+            The offsets where each abbreviation occurs in the text of the fragments joined
+            with spaces, as abbreviation_detector.find_abbreviations fills them.
+        fragments, normalized :
+            The fragments and their NormalizedText, as returned by get_normalized_text.
+
+        Returns a dictionary of the (fragment, offset in its text, run) of each occurrence of
+        each abbreviation, the run being as returned by locate_run.
+        """
+        # The paragraph elements of each part are looked up once, not for each occurrence
+        paragraphs = get_loaded_part_paragraphs(self.doc)
+        located = dict()
+        for abbreviation, offsets in occurrences.items():
+            located[abbreviation] = []
+            for offset in offsets:
+                index, fragment_offset = normalized.locate_original(offset)
+                fragment = fragments[index]
+                run = locate_run(paragraphs[fragment.part][fragment.paragraph], fragment_offset)
+                located[abbreviation].append((fragment, fragment_offset, run))
+        return located
 
-    
-    def move_table_after(table, paragraph):
-        tbl, p = table._tbl, paragraph._p
-        p.addnext(tbl)
 
-    def set_col_widths(table):
-        widths = (Inches(0.1), Inches(2))
-        for row in table.rows:
-            for idx, width in enumerate(widths):
-                row.cells[idx].width = width
 
     def update_document(self, abbreviations, path):
         """
         Inserts a table of abbreviations and their definitions into the Word document.
 
+        The whole table is built from the pre-built rows of table_template.abbreviations_table
+        and inserted once, rather than adding the rows and styling the cells one at a time
+        through python-docx, which walks the table again for every row.
+
         Parameters:
         -----------
         abbreviations : dict
@@ -76,63 +162,70 @@ class DocAcronymMaster:
         font = run.font
         font.color.rgb = RGBColor(173, 216, 230)  # Light blue color
 
-        # Add a table after the new paragraph
-        table = self.doc.add_table(rows=1, cols=2)
-
-        # Move table before the selected paragraph
-        DocAcronymMaster.move_table_after(table, paragraph)
-
-        # Set table headers
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Abbreviation'
-        hdr_cells[1].text = 'Definition'
-
-        # Style the header row
-        for cell in table.rows[0].cells:
-            paragraph = cell.paragraphs[0]
-            # paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = paragraph.add_run()
-            run.font.bold = True
-            # Set background color of the header cells
-            shading_elm = parse_xml(r'<w:shd xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" w:fill="590B0B"/>')
-            cell._tc.get_or_add_tcPr().append(shading_elm)
-
-
-        # Add a border to the entire table
-        table.style = 'Table Grid'
-        # Adjust the row height
-        for row in table.rows:
-            row.height = Pt(12)  # Adjust as needed
-
-        # Add rows for each abbreviation
-        for abbr, defn in abbreviations.items():
-            row_cells = table.add_row().cells
-            row_cells[0].text = abbr
-            row_cells[1].text = defn
-
-            # Adjust row height
-            row_cells[0]._element.get_or_add_tcPr().get_or_add_tcW().attrib[qn('w:w')] = '2000'
-            row_cells[1]._element.get_or_add_tcPr().get_or_add_tcW().attrib[qn('w:w')] = '4000'
-
-
-        DocAcronymMaster.set_col_widths(table)
+        # Add the table right after the new paragraph
+        # Same grid and style as python-docx's add_table(rows, 2) with the 'Table Grid' style
+        table = abbreviations_table.make_table(
+            ('Abbreviation', 'Definition'), abbreviations.items(),
+            style_id=self.doc.part.get_style_id('Table Grid', WD_STYLE_TYPE.TABLE),
+            grid_width=Emu(self.doc._block_width // 2))
+        paragraph._p.addnext(table)
+
+    @staticmethod
+    def get_file_state(path):
+        # Size and modification time of a file, or None if there is no such file
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def saveDocument(self, path, fast=True):
+        """
+        Saves the document to path, a file path or a writable binary file.
 
+        When fast is set and the file the document was loaded from has not changed since,
+        only the main document part is written again: every other part, like the images,
+        is copied from that file as it is, without compressing it again. Otherwise, if parts
+        or relationships were added to the document, or if path is that file, python-docx
+        writes every part.
+        """
+        if fast and self.source_state is not None and DocAcronymMaster.get_file_state(self.source) == self.source_state:
+            start = None if isinstance(path, (str, os.PathLike)) else path.tell()
+            try:
+                save_main_part(self.doc, self.source, path)
+                return
+            except PackageNotCopied:
+                # Drop whatever was written to the file before saving it in full
+                if start is not None:
+                    path.seek(start)
+                    path.truncate()
 
-    def saveDocument(self, path):
         # Save the document
         self.doc.save(path)
 
+    def save_to_buffer(self):
+        """
+        Saves the document once and returns the saved file, rewound, as a buffer kept in memory
+        up to SPOOL_SIZE bytes and in a temporary file beyond. Writing it out later with
+        utils.write_buffer is a plain copy, so the document itself can be released.
+        """
+        buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        self.saveDocument(buffer)
+        buffer.seek(0)
+        return buffer
+
 
 def main():
-    from abbreviation_detector import get_abbreviations
+    from abbreviation_detector import find_abbreviations
 
     docMaster = DocAcronymMaster("document.docx")
     # get the text of the document
     text = docMaster.get_text()
     # get the abbreviations in the text
-    abbreviations = get_abbreviations(text)
+    abbreviations = find_abbreviations(text)
     # update the document with the table of abbreviations
-    docMaster.update_document(abbreviations)
+    docMaster.update_document(abbreviations, "document-updated.docx")
+    docMaster.saveDocument("document-updated.docx")
 
 if __name__ == "__main__":
     main()
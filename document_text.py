@@ -0,0 +1,305 @@
+from collections import namedtuple
+from lxml import etree
+import posixpath
+import zipfile
+
+# Namespaces of the WordprocessingML document, the package relationships and markup compatibility
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+RELS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+MC = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+
+# Relationship type of the main document part, and where Word puts it
+OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+DEFAULT_MAIN_PART = 'word/document.xml'
+
+BODY = f'{{{W}}}body'
+PARAGRAPH = f'{{{W}}}p'
+RUN = f'{{{W}}}r'
+HYPERLINK = f'{{{W}}}hyperlink'
+TEXT = f'{{{W}}}t'
+BREAK = f'{{{W}}}br'
+BREAK_TYPE = f'{{{W}}}type'
+
+TABLE = f'{{{W}}}tbl'
+ROW = f'{{{W}}}tr'
+CELL = f'{{{W}}}tc'
+TEXT_BOX = f'{{{W}}}txbxContent'
+FOOTNOTE = f'{{{W}}}footnote'
+ENDNOTE = f'{{{W}}}endnote'
+NOTE_ID = f'{{{W}}}id'
+NOTE_TYPE = f'{{{W}}}type'
+FALLBACK = f'{{{MC}}}Fallback'
+
+# Elements holding the paragraphs and tables of a story, whose finished children can be freed
+STORY_ROOTS = {BODY, f'{{{W}}}hdr', f'{{{W}}}ftr', FOOTNOTE, ENDNOTE}
+
+# Elements of a paragraph that hold runs of its text: tracked insertions, content controls, fields...
+# Deleted text is in w:del and w:moveFrom, which are left out.
+RUN_CONTAINERS = {HYPERLINK, f'{{{W}}}ins', f'{{{W}}}moveTo', f'{{{W}}}smartTag', f'{{{W}}}fldSimple',
+                  f'{{{W}}}sdt', f'{{{W}}}sdtContent', f'{{{W}}}customXml'}
+
+# Stories of the parts related to the main document, by relationship type
+RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+STORIES = {
+    RELATIONSHIPS + 'header': 'header',
+    RELATIONSHIPS + 'footer': 'footer',
+    RELATIONSHIPS + 'footnotes': 'footnote',
+    RELATIONSHIPS + 'endnotes': 'endnote',
+}
+
+# A paragraph of text of a document and where it is:
+# part      name of the package part, like 'word/document.xml' or 'word/header1.xml'
+# story     'body', 'header', 'footer', 'footnote' or 'endnote'
+# paragraph position of the paragraph among the paragraphs of its part
+# table     position of the table among the tables of its part, row and cell in that table, or None
+# text_box  whether the paragraph is in a text box (or shape)
+# note      id of the footnote or endnote, or None
+Fragment = namedtuple('Fragment', ['text', 'part', 'story', 'paragraph', 'table', 'row', 'cell', 'text_box', 'note'])
+
+# Text of the run elements other than w:t and w:br, as python-docx translates them
+RUN_CHARACTERS = {
+    f'{{{W}}}tab': '\t',
+    f'{{{W}}}ptab': '\t',
+    f'{{{W}}}cr': '\n',
+    f'{{{W}}}noBreakHyphen': '-',
+}
+
+
+# Function to find the name of the main document part of a .docx package from its relationships
+def get_main_part(package):
+    try:
+        rels = etree.fromstring(package.read('_rels/.rels'))
+    except KeyError:
+        return DEFAULT_MAIN_PART
+    for rel in rels.iter(f'{{{RELS}}}Relationship'):
+        if rel.get('Type') == OFFICE_DOCUMENT:
+            return posixpath.normpath(rel.get('Target').lstrip('/'))
+    return DEFAULT_MAIN_PART
+
+
+# Function to get the text of a run, the same way as python-docx's Run.text
+def get_run_text(run):
+    parts = []
+    for child in run:
+        if child.tag == TEXT:
+            parts.append(child.text or '')
+        elif child.tag == BREAK:
+            # Line breaks are a newline, page and column breaks have no text
+            if child.get(BREAK_TYPE, 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        elif child.tag in RUN_CHARACTERS:
+            parts.append(RUN_CHARACTERS[child.tag])
+    return ''.join(parts)
+
+
+# Function to get the text of a paragraph, the same way as python-docx's Paragraph.text:
+# its runs and the runs of its hyperlinks
+def get_paragraph_text(paragraph):
+    parts = []
+    for child in paragraph:
+        if child.tag == RUN:
+            parts.append(get_run_text(child))
+        elif child.tag == HYPERLINK:
+            parts.extend(get_run_text(run) for run in child if run.tag == RUN)
+    return ''.join(parts)
+
+
+# Function to yield the text of each body paragraph of a .docx file (the paragraphs of Document.paragraphs),
+# parsing the main document part as a stream without building python-docx's object model.
+# Each paragraph and whatever came before it is freed once its text is yielded.
+def iter_document_paragraphs(path):
+    with zipfile.ZipFile(path) as package, package.open(get_main_part(package)) as xml:
+        for _, element in etree.iterparse(xml, events=('end',), tag=PARAGRAPH, huge_tree=True):
+            parent = element.getparent()
+            # Paragraphs of tables and text boxes are not body paragraphs
+            if parent is None or parent.tag != BODY:
+                continue
+
+            yield get_paragraph_text(element)
+
+            element.clear()
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+# Function to get the text of a .docx file like DocAcronymMaster.get_text, without loading the document
+def get_document_text(path):
+    return ' '.join(iter_document_paragraphs(path))
+
+
+# Function to get the whole text of a paragraph: its runs, including the ones in hyperlinks, tracked insertions,
+# content controls and fields. Text boxes anchored in the paragraph are paragraphs of their own.
+def get_content_text(paragraph):
+    parts = []
+    for child in paragraph:
+        if child.tag == RUN:
+            parts.append(get_run_text(child))
+        elif child.tag in RUN_CONTAINERS:
+            parts.append(get_content_text(child))
+    return ''.join(parts)
+
+
+# Function to yield the runs whose text get_content_text joins, in the same order
+def iter_content_runs(paragraph):
+    for child in paragraph:
+        if child.tag == RUN:
+            yield child
+        elif child.tag in RUN_CONTAINERS:
+            yield from iter_content_runs(child)
+
+
+# Function to find the run holding the character at offset of the text of a paragraph (see get_content_text).
+# Returns the run element, its index among the runs of iter_content_runs and the offset in its text,
+# the end of the text being in the last run, or None if the offset is past the text.
+def locate_run(paragraph, offset):
+    start = 0
+    last = None
+    for index, run in enumerate(iter_content_runs(paragraph)):
+        length = len(get_run_text(run))
+        if offset < start + length:
+            return run, index, offset - start
+        start += length
+        last = run, index, length
+    return last if last is not None and offset == start else None
+
+
+# Function to turn the (event, element) pairs of a part into its fragments.
+# The events come from etree.iterparse or etree.iterwalk, with 'start' and 'end' events for FRAGMENT_TAGS.
+# When free is set, the children of the story roots are freed once done (only for parsed, unshared trees).
+def iter_part_fragments(events, part, story, free=False):
+    paragraphs = 0
+    tables = 0
+    # [table, row, cell] of each table the current element is in, innermost last
+    cells = []
+    text_boxes = 0
+    fallbacks = 0
+    note = None
+
+    for event, element in events:
+        tag = element.tag
+        if event == 'start':
+            if tag == TABLE:
+                cells.append([tables, -1, -1])
+                tables += 1
+            elif tag == ROW and cells:
+                cells[-1][1] += 1
+                cells[-1][2] = -1
+            elif tag == CELL and cells:
+                cells[-1][2] += 1
+            elif tag == TEXT_BOX:
+                text_boxes += 1
+            elif tag == FALLBACK:
+                # Text boxes are written twice, as a shape and as its VML fallback; only the shape is read
+                fallbacks += 1
+            elif tag in (FOOTNOTE, ENDNOTE):
+                note = element.get(NOTE_ID)
+            continue
+
+        if tag == PARAGRAPH and not fallbacks:
+            # Separators between the notes and the page have no text of their own
+            if note is None or element.getparent().get(NOTE_TYPE) is None:
+                table, row, cell = cells[-1] if cells else (None, None, None)
+                yield Fragment(get_content_text(element), part, story, paragraphs, table, row, cell,
+                               text_boxes > 0, note)
+            paragraphs += 1
+        elif tag == TABLE:
+            cells.pop()
+        elif tag == TEXT_BOX:
+            text_boxes -= 1
+        elif tag == FALLBACK:
+            fallbacks -= 1
+        elif tag in (FOOTNOTE, ENDNOTE):
+            note = None
+
+        if free:
+            parent = element.getparent()
+            if parent is not None and (parent.tag in STORY_ROOTS or tag in (FOOTNOTE, ENDNOTE)):
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+
+# Tags iter_part_fragments needs events for
+FRAGMENT_TAGS = [PARAGRAPH, TABLE, ROW, CELL, TEXT_BOX, FALLBACK, FOOTNOTE, ENDNOTE]
+
+
+# Function to find the headers, footers, footnotes and endnotes of the main document part of a package,
+# as (part name, story) pairs in part name order
+def get_story_parts(package, main_part):
+    folder, name = posixpath.split(main_part)
+    try:
+        rels = etree.fromstring(package.read(posixpath.join(folder, '_rels', f'{name}.rels')))
+    except KeyError:
+        return []
+
+    parts = []
+    for rel in rels.iter(f'{{{RELS}}}Relationship'):
+        story = STORIES.get(rel.get('Type'))
+        if story is not None and rel.get('TargetMode') != 'External':
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target.lstrip('/')
+            else:
+                target = posixpath.normpath(posixpath.join(folder, target))
+            parts.append((target, story))
+    return sorted(parts)
+
+
+# Function to yield every fragment of text of a .docx file: the body (with its tables and text boxes),
+# then the headers, footers, footnotes and endnotes. Each part is parsed once, as a stream.
+def iter_document_fragments(path):
+    with zipfile.ZipFile(path) as package:
+        main_part = get_main_part(package)
+        for part, story in [(main_part, 'body')] + get_story_parts(package, main_part):
+            with package.open(part) as xml:
+                events = etree.iterparse(xml, events=('start', 'end'), tag=FRAGMENT_TAGS, huge_tree=True)
+                yield from iter_part_fragments(events, part, story, free=True)
+
+
+# Function to find the parts of a document loaded with python-docx that iter_loaded_document_fragments reads,
+# as (part, story) pairs: the main document part, then the others in part name order
+def get_loaded_story_parts(document):
+    main_part = document.part
+    parts = [(main_part, 'body')]
+    for rel in main_part.rels.values():
+        story = STORIES.get(rel.reltype)
+        if story is not None and not rel.is_external:
+            parts.append((rel.target_part, story))
+    parts[1:] = sorted(parts[1:], key=lambda part: str(part[0].partname))
+    return parts
+
+
+# Function to get the root element of a part of a loaded document.
+# python-docx parses the headers and footers, but keeps the notes as raw XML, which is parsed on each call.
+def get_loaded_part_root(part):
+    return part.element if hasattr(part, 'element') else etree.fromstring(part.blob)
+
+
+# Function to yield every fragment of text of a document already loaded with python-docx, like
+# iter_document_fragments, walking the parsed parts instead of reading the file again
+def iter_loaded_document_fragments(document):
+    for part, story in get_loaded_story_parts(document):
+        events = etree.iterwalk(get_loaded_part_root(part), events=('start', 'end'), tag=FRAGMENT_TAGS)
+        yield from iter_part_fragments(events, str(part.partname).lstrip('/'), story)
+
+
+# Function to get the paragraph elements of a part, indexed like the paragraph of its fragments: in the order
+# they end, so text box paragraphs come before the paragraph they are anchored in, and without text box fallbacks
+def get_part_paragraphs(root):
+    return [paragraph for _, paragraph in etree.iterwalk(root, events=('end',), tag=PARAGRAPH)
+            if next(paragraph.iterancestors(FALLBACK), None) is None]
+
+
+# Function to get the paragraph elements of every part of a document loaded with python-docx, by part name
+# like the part of its fragments, for finding the paragraphs of many fragments at once
+def get_loaded_part_paragraphs(document):
+    return {str(part.partname).lstrip('/'): get_part_paragraphs(get_loaded_part_root(part))
+            for part, _ in get_loaded_story_parts(document)}
+
+
+# Function to find the paragraph element of a fragment of a document loaded with python-docx
+def get_loaded_fragment_paragraph(document, fragment):
+    for part, _ in get_loaded_story_parts(document):
+        if str(part.partname).lstrip('/') == fragment.part:
+            return get_part_paragraphs(get_loaded_part_root(part))[fragment.paragraph]
+    raise KeyError(fragment.part)
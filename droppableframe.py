@@ -6,6 +6,7 @@ class DroppableFrame(QFrame):
     def __init__(self, parent):
         super().__init__(parent)
         self.setAcceptDrops(True)
+        self.batch_upload_function = None
 
     def dragEnterEvent(self, event: QDragEnterEvent):
         if event.mimeData().hasUrls():
@@ -13,9 +14,17 @@ class DroppableFrame(QFrame):
 
     def dropEvent(self, event: QDropEvent):
         urls = event.mimeData().urls()
-        for url in urls:
-            file_path = url.toLocalFile()
+        file_paths = [url.toLocalFile() for url in urls]
+        # Several documents dropped at once are processed together
+        if len(file_paths) > 1 and self.batch_upload_function is not None:
+            self.batch_upload_function(file_paths)
+            return
+
+        for file_path in file_paths:
             self.upload_function(file_path)
 
     def set_upload_function(self, upload_function):
-        self.upload_function = upload_function
\ No newline at end of file
+        self.upload_function = upload_function
+
+    def set_batch_upload_function(self, batch_upload_function):
+        self.batch_upload_function = batch_upload_function
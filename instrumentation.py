@@ -0,0 +1,181 @@
+from contextlib import contextmanager, nullcontext
+import cProfile
+import datetime
+import hashlib
+import json
+import os
+import pstats
+import time
+import tracemalloc
+
+# Number of functions listed in a report when the document was profiled
+PROFILE_FUNCTIONS = 25
+
+# Number of hexadecimal digits of the path hash in the name of a report
+REPORT_HASH_LENGTH = 8
+
+
+class PipelineMonitor:
+    """
+    Records the wall time, CPU time, peak memory and tokens of each stage of processing a document,
+    and forwards progress values to a signal.
+
+    A monitor is passed wherever a progress signal is expected, so the detection functions can
+    time their stages without knowing whether anyone is listening.
+
+    Attributes
+    ----------
+    signal : object
+        the signal progress values are forwarded to, or None
+    profile : cProfile.Profile
+        the profiler enabled during the stages, or None when not profiling
+    track_memory : bool
+        whether the peak memory of each stage is traced with tracemalloc (slows processing down)
+    stages : dict
+        the totals of each stage by name, in the order they first ran
+    """
+
+    def __init__(self, signal=None, profile=False, track_memory=True):
+        """
+        Parameters:
+        -----------
+        signal : object
+            The signal progress values are forwarded to.
+        profile : bool
+            Whether to run the stages under cProfile.
+        track_memory : bool
+            Whether to trace the peak memory of each stage.
+        """
+        self.signal = signal
+        self.profile = cProfile.Profile() if profile else None
+        self.track_memory = track_memory
+        self.stages = {}
+        self.progress = 0
+        self._started = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self._stopped = None
+        self._tracing = False
+
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            # Stop tracing again once the document is done, unless someone else started it
+            self._tracing = True
+
+    def emit(self, value):
+        # Progress never goes backwards, whichever stage reports it
+        self.progress = max(self.progress, value)
+        if self.signal is not None:
+            self.signal.emit(self.progress)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the code run inside the with block as a stage. Stages must not be nested.
+        """
+        # Before Python 3.9 the peak cannot be reset, so it is the peak since the document started
+        if self.track_memory and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        if self.profile is not None:
+            self.profile.enable()
+        started = time.perf_counter()
+        started_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - started
+            cpu = time.process_time() - started_cpu
+            if self.profile is not None:
+                self.profile.disable()
+            peak = tracemalloc.get_traced_memory()[1] if self.track_memory else None
+
+            record = self.stages.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0,
+                                                   "peak_memory": peak, "tokens": 0})
+            record["calls"] += 1
+            record["wall"] += wall
+            record["cpu"] += cpu
+            if peak is not None:
+                record["peak_memory"] = max(record["peak_memory"] or 0, peak)
+
+    def add_tokens(self, name, tokens):
+        """
+        Counts tokens processed by a stage.
+        """
+        self.stages.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak_memory": None, "tokens": 0})
+        self.stages[name]["tokens"] += tokens
+
+    def stop(self):
+        """
+        Stops timing the document and tracing memory.
+        """
+        if self._stopped is None:
+            self._stopped = (time.perf_counter(), time.process_time())
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+
+    def report(self, **document):
+        """
+        Returns the performance report of the document as a dictionary. The keyword arguments
+        describe the document (path, mode, ...) and are included as they are.
+        """
+        self.stop()
+        stopped, stopped_cpu = self._stopped
+        peaks = [record["peak_memory"] for record in self.stages.values() if record["peak_memory"] is not None]
+
+        report = {
+            "created": datetime.datetime.now().isoformat(timespec='seconds'),
+            **document,
+            "wall": stopped - self._started,
+            "cpu": stopped_cpu - self._started_cpu,
+            "peak_memory": max(peaks) if peaks else None,
+            "tokens": self.stages.get("nlp", {}).get("tokens", 0),
+            "stages": self.stages,
+        }
+        if self.profile is not None:
+            report["profile"] = get_profile_functions(self.profile)
+        return report
+
+    def dump(self, path, **document):
+        """
+        Writes the performance report of the document to a JSON file, and the raw cProfile
+        statistics next to it (same name, .prof extension) when the stages were profiled.
+        """
+        report = self.report(**document)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        if self.profile is not None:
+            self.profile.dump_stats(f'{os.path.splitext(path)[0]}.prof')
+        return report
+
+
+# Function to list the functions that took the most cumulative time in a profile
+def get_profile_functions(profile, count=PROFILE_FUNCTIONS):
+    stats = pstats.Stats(profile).stats
+    functions = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.items():
+        functions.append({"function": f"{os.path.basename(filename)}:{line}({function})",
+                          "calls": calls, "tottime": tottime, "cumtime": cumtime})
+    functions.sort(key=lambda function: function["cumtime"], reverse=True)
+    return functions[:count]
+
+
+# Function to time a stage when the signal is a PipelineMonitor, and do nothing otherwise
+def measure(signal, name):
+    if isinstance(signal, PipelineMonitor):
+        return signal.stage(name)
+    return nullcontext()
+
+
+# Function to count the tokens processed by a stage when the signal is a PipelineMonitor
+def count_tokens(signal, name, tokens):
+    if isinstance(signal, PipelineMonitor):
+        signal.add_tokens(name, tokens)
+
+
+# Function to return the path of the performance report of a document in a folder. Documents of the same
+# name in different folders, like the ones cli.py finds searching a folder, get different reports from
+# a short hash of their full path.
+def report_path(file, folder):
+    name = os.path.splitext(os.path.basename(file))[0]
+    digest = hashlib.sha256(os.path.abspath(file).encode('utf-8')).hexdigest()[:REPORT_HASH_LENGTH]
+    return os.path.join(folder, f'{name}-{digest}-performance.json')
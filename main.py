@@ -1,13 +1,15 @@
 from PyQt5 import QtGui, QtWidgets, QtCore
 from home import Ui_MainWindow
-from docacronym_master import DocAcronymMaster
-from abbreviation_detector import find_abbreviations
-from utils import get_users_desktop_folder
+from workers import DocumentWorker, BatchWorker, warm_up_pipeline
+from utils import get_users_desktop_folder, write_buffer
+import multiprocessing
+import threading
 import os
 import ctypes
 
 myappid = 'tahiralauddin.acronym-master.1.0.0' # arbitrary string
-ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
+if hasattr(ctypes, 'windll'):
+    ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
 
 class MyMainWindow(QtWidgets.QMainWindow):
     documentProgressSignal = QtCore.pyqtSignal(int)
@@ -18,17 +20,35 @@ class MyMainWindow(QtWidgets.QMainWindow):
         self.ui.setupUi(self)
         self.setWindowIcon(QtGui.QIcon("images/logo-icon-transparent.ico"))
         self.setWindowTitle("Acronym Master")
+        self.workerThread = None
+        self.worker = None
+        self.document = None
         self.Ui_Components()
 
 
     def Ui_Components(self):
         self.ui.uploadDocumentFrame.set_upload_function(self.processDocument)
+        self.ui.uploadDocumentFrame.set_batch_upload_function(self.processDocuments)
         self.ui.uploadDocumentFrame.mousePressEvent = self.uploadDocument
         self.ui.progressBar.setValue(0)
+        # Status of each document of a batch, shown under the progress bar while the batch runs
+        self.batchStatusLabel = QtWidgets.QLabel(self.ui.frame_4)
+        self.batchStatusLabel.setObjectName("batchStatusLabel")
+        self.batchStatusLabel.hide()
+        self.ui.verticalLayout_10.addWidget(self.batchStatusLabel)
+        # Cancels the documents being processed, shown under the progress bar while a worker runs
+        self.cancelButton = QtWidgets.QPushButton("Cancel", self.ui.frame_4)
+        self.cancelButton.setObjectName("cancelButton")
+        self.cancelButton.setToolTip("Stop processing (Esc)")
+        self.cancelButton.clicked.connect(self.cancelProcessing)
+        self.cancelButton.hide()
+        self.ui.verticalLayout_10.addWidget(self.cancelButton)
         self.ui.stackedWidget.setCurrentIndex(0)
         self.ui.downloadButton.clicked.connect(self.downloadDocument)
         self.ui.helpButton.clicked.connect(self.help)
         self.documentProgressSignal.connect(self.updateProgress)
+        # Escape cancels the document being processed
+        QtWidgets.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key_Escape), self, self.cancelProcessing)
         self.setMinimumSize(800, 500) # set the minimum size
         self.setWhiteTheme()
 
@@ -50,38 +70,129 @@ class MyMainWindow(QtWidgets.QMainWindow):
             self.processDocument(file)
 
     def processDocument(self, file, *args):
-        self.docMaster = DocAcronymMaster(file)
-        # Emit signal
-        self.documentProgressSignal.emit(10)
-    
-        # get the text of the document
-        text = self.docMaster.get_text()
+        if self.workerThread is not None:
+            QtWidgets.QMessageBox.information(self, "Please Wait", "A document is already being processed.")
+            return
 
-        # Emit signal
-        self.documentProgressSignal.emit(20)
-    
-        # get the abbreviations in the text
-        abbreviations = find_abbreviations(text, self.documentProgressSignal)
-        # update the document with the table of abbreviations
-        fullpath, filename = os.path.split(file)
-        self.filepath = os.path.join(fullpath, f'{os.path.splitext(filename)[0]}-updated.docx')
-        # Emit signal
-        self.documentProgressSignal.emit(90)
-    
-        try:
-            self.docMaster.update_document(abbreviations, self.filepath)
-        except PermissionError:
-            self.filepath = os.path.join(get_users_desktop_folder(), f'{filename}-updated.docx')
-            self.docMaster.update_document(abbreviations, self.filepath)
+        # Run the pipeline in a worker thread so the window keeps repainting
+        self.workerThread = QtCore.QThread(self)
+        # Set ACRONYM_MASTER_REPORT to a folder to get a performance report of each document,
+        # and ACRONYM_MASTER_PROFILE=1 to profile it as well
+        self.worker = DocumentWorker(file, os.environ.get("ACRONYM_MASTER_REPORT"),
+                                     bool(os.environ.get("ACRONYM_MASTER_PROFILE")))
+        self.worker.moveToThread(self.workerThread)
+
+        self.workerThread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.documentProgressSignal)
+        self.worker.finished.connect(self.documentProcessed)
+        self.worker.failed.connect(self.documentFailed)
+        self.worker.cancelled.connect(self.documentCancelled)
+
+        # Stop the thread once the worker is done, whatever the outcome
+        self.worker.finished.connect(self.workerThread.quit)
+        self.worker.failed.connect(self.workerThread.quit)
+        self.worker.cancelled.connect(self.workerThread.quit)
+        self.workerThread.finished.connect(self.threadFinished)
+
+        self.workerThread.start()
+        self.showCancelButton()
+
+    def processDocuments(self, files):
+        if self.workerThread is not None:
+            QtWidgets.QMessageBox.information(self, "Please Wait", "A document is already being processed.")
+            return
+
+        # Progress of each document, the progress bar shows their average
+        self.batchProgress = {file: 0 for file in files}
+        self.batchResults = {}
+        self.updateBatchProgress()
+        self.batchStatusLabel.show()
+
+        # Process the documents in a pool of processes, driven from a worker thread
+        self.workerThread = QtCore.QThread(self)
+        self.worker = BatchWorker(files)
+        self.worker.moveToThread(self.workerThread)
+
+        self.workerThread.started.connect(self.worker.run)
+        self.worker.fileProgress.connect(self.batchFileProgress)
+        self.worker.fileFinished.connect(self.batchFileFinished)
+        self.worker.fileFailed.connect(self.batchFileFailed)
+        self.worker.finished.connect(self.batchFinished)
+        self.worker.finished.connect(self.workerThread.quit)
+        self.workerThread.finished.connect(self.threadFinished)
+
+        self.workerThread.start()
+        self.showCancelButton()
+
+    def batchFileProgress(self, file, value):
+        self.batchProgress[file] = value
+        self.updateBatchProgress()
+
+    def batchFileFinished(self, file, filepath):
+        self.batchProgress[file] = 100
+        self.batchResults[file] = f"saved as {os.path.basename(filepath)}"
+        self.updateBatchProgress()
+
+    def batchFileFailed(self, file, message):
+        self.batchProgress[file] = 100
+        self.batchResults[file] = f"failed: {message}"
+        self.updateBatchProgress()
 
-        # Emit signal
-        self.documentProgressSignal.emit(100)
+    def updateBatchProgress(self):
+        done = len(self.batchResults)
+        total = len(self.batchProgress)
+        self.ui.progressBar.setFormat(f"%p% ({done}/{total} documents)")
+        self.ui.progressBar.setValue(sum(self.batchProgress.values()) // total)
+        self.batchStatusLabel.setText("\n".join(f"{os.path.basename(file)}: {self.getBatchStatus(file)}"
+                                                for file in self.batchProgress))
+
+    def getBatchStatus(self, file):
+        if file in self.batchResults:
+            return self.batchResults[file]
+        return f"{self.batchProgress[file]}%" if self.batchProgress[file] else "waiting"
+
+    def batchFinished(self):
+        summary = "\n".join(f"{os.path.basename(file)}: {result}" for file, result in self.batchResults.items())
+        QtWidgets.QMessageBox.information(self, "Documents Processed", summary)
+        self.batchStatusLabel.hide()
+        self.ui.progressBar.setFormat("%p%")
+        self.ui.progressBar.setValue(0)
+
+    def documentProcessed(self, filepath, filename):
+        # Only the saved copy of the updated document is kept until it is downloaded
+        self.releaseDocument()
+        self.document = self.worker.document
+        self.worker.document = None
+        self.filepath = filepath
 
         self.ui.stackedWidget.setCurrentIndex(1)
 
         # Set Download Page information
         self.ui.downloadButtonInformation.setText(filename)
-    
+
+    def documentFailed(self, message):
+        self.ui.progressBar.setValue(0)
+        QtWidgets.QMessageBox.warning(self, "Processing Failed", f"The document could not be processed: {message}")
+
+    def documentCancelled(self):
+        self.ui.progressBar.setValue(0)
+
+    def threadFinished(self):
+        self.worker.deleteLater()
+        self.workerThread.deleteLater()
+        self.worker = None
+        self.workerThread = None
+        self.cancelButton.hide()
+
+    def showCancelButton(self):
+        self.cancelButton.setEnabled(True)
+        self.cancelButton.show()
+
+    def cancelProcessing(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            # The worker stops at its next progress update, or once the documents in progress are done
+            self.cancelButton.setEnabled(False)
 
     def addProgressBar(self):
 
@@ -105,8 +216,18 @@ class MyMainWindow(QtWidgets.QMainWindow):
     def updateProgress(self, value):
         self.ui.progressBar.setValue(value)
 
+    def releaseDocument(self):
+        if self.document is not None:
+            self.document.close()
+            self.document = None
+
     def downloadDocument(self):
-        self.docMaster.saveDocument(self.filepath)
+        try:
+            write_buffer(self.document, self.filepath)
+        except PermissionError:
+            self.filepath = os.path.join(get_users_desktop_folder(), os.path.basename(self.filepath))
+            write_buffer(self.document, self.filepath)
+        self.releaseDocument()
         QtWidgets.QMessageBox.information(self, "File Downloaded", f"The document is saved as {os.path.basename(self.filepath)} successfully!")
         self.ui.progressBar.setValue(0)
         self.ui.stackedWidget.setCurrentIndex(0)
@@ -114,9 +235,22 @@ class MyMainWindow(QtWidgets.QMainWindow):
     def help(self):
         pass
 
+    def closeEvent(self, a0) -> None:
+        # Let a running worker stop before the window goes away
+        if self.workerThread is not None:
+            self.worker.cancel()
+            self.workerThread.quit()
+            self.workerThread.wait()
+        self.releaseDocument()
+        return super().closeEvent(a0)
+
 if __name__ == "__main__":
     import sys
+    # Needed for the batch process pool in the frozen executable
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication(sys.argv)
     mainWindow = MyMainWindow()
     mainWindow.show()
+    # Import spaCy and load the pipeline in the background once the window is on screen
+    QtCore.QTimer.singleShot(0, lambda: threading.Thread(target=warm_up_pipeline, daemon=True).start())
     sys.exit(app.exec_())
@@ -0,0 +1,115 @@
+import spacy
+from spacy.matcher import Matcher
+# Imported only to register the "abbreviation_detector" factory that add_pipe uses
+from scispacy.abbreviation import AbbreviationDetector  # noqa: F401
+import threading
+import os
+
+# Directory the bundled spaCy model is looked up from (same as the frozen executable's folder)
+BASE_DIR = os.path.abspath('.')
+
+# Name of the spaCy model bundled next to the application
+DEFAULT_MODEL = 'en_core_web_sm'
+
+# Trained components of the bundled model, in pipeline order
+PIPELINE_COMPONENTS = ["tok2vec", "tagger", "parser", "senter", "attribute_ruler", "lemmatizer", "ner"]
+
+# Components kept in fast detect mode. The Matcher only reads token text and IS_UPPER, and the
+# scispacy abbreviation detector only matches parentheses on the tokens, so none are required.
+# Add "senter" here if sentence boundaries are ever needed; it is much cheaper than the parser.
+FAST_DETECT_COMPONENTS = []
+
+# Loaded pipelines and matchers, keyed by (model name, fast). Each pipeline is loaded once per process.
+_pipelines = {}
+_matchers = {}
+_lock = threading.Lock()
+
+
+# Function to resolve the on-disk location of a model name
+def get_model_path(name=DEFAULT_MODEL):
+    # Prefer the bundled copy of the model if there is one
+    path = os.path.join(BASE_DIR, name)
+    if os.path.isdir(path):
+        return path
+    # Otherwise let spaCy resolve it as an installed package
+    return name
+
+
+# Function to load a spaCy pipeline with the scispacy abbreviation detector attached
+def _load_pipeline(name, fast):
+    if fast:
+        # Leave out every trained component that fast detect mode does not need
+        exclude = [component for component in PIPELINE_COMPONENTS if component not in FAST_DETECT_COMPONENTS]
+        nlp = spacy.load(get_model_path(name), exclude=exclude)
+        # Components such as senter are disabled by default in the bundled model
+        for component in FAST_DETECT_COMPONENTS:
+            if component in nlp.disabled:
+                nlp.enable_pipe(component)
+    else:
+        nlp = spacy.load(get_model_path(name))
+    # The abbreviation detector is shared by every caller of this pipeline. Serializable results
+    # let documents processed by nlp.pipe(..., n_process=N) be sent back from worker processes.
+    nlp.add_pipe("abbreviation_detector", config={"make_serializable": True})
+    return nlp
+
+
+# Function to return the process-wide pipeline for a model, loading it on first use
+def get_nlp(name=DEFAULT_MODEL, fast=False):
+    key = (name, fast)
+    nlp = _pipelines.get(key)
+    if nlp is not None:
+        return nlp
+
+    with _lock:
+        # Another thread may have loaded it while we were waiting for the lock
+        if key not in _pipelines:
+            _pipelines[key] = _load_pipeline(name, fast)
+        return _pipelines[key]
+
+
+# Function to return the process-wide abbreviation Matcher for a model
+def get_matcher(name=DEFAULT_MODEL, fast=False):
+    key = (name, fast)
+    matcher = _matchers.get(key)
+    if matcher is not None:
+        return matcher
+
+    nlp = get_nlp(name, fast)
+    with _lock:
+        if key not in _matchers:
+            # Initialize a Matcher with the shared vocabulary
+            matcher = Matcher(nlp.vocab)
+
+            # Define a pattern to match capitalized words
+            abbreviation_pattern1 = [{"IS_UPPER": True}]
+
+            # Define a pattern to match abbreviations like 'Ph.D.'
+            abbreviation_pattern2 = [{"TEXT": {"REGEX": r'\b[A-Za-z]+\.[A-Za-z\.]*'}}]
+
+            # Add the patterns to the matcher
+            matcher.add("Abbreviation1", [abbreviation_pattern1])
+            matcher.add("Abbreviation2", [abbreviation_pattern2])
+
+            _matchers[key] = matcher
+        return _matchers[key]
+
+
+# Function to load the pipeline and matcher ahead of the first document
+def warm_up(name=DEFAULT_MODEL, fast=False):
+    get_nlp(name, fast)
+    get_matcher(name, fast)
+
+
+# Function to drop loaded pipelines so their memory can be reclaimed
+def unload(name=None):
+    with _lock:
+        # Unload every model when no name is given
+        keys = [key for key in _pipelines if name is None or key[0] == name]
+        for key in keys:
+            _pipelines.pop(key, None)
+            _matchers.pop(key, None)
+
+
+# Function to check whether a model is already loaded in this process
+def is_loaded(name=DEFAULT_MODEL, fast=False):
+    return (name, fast) in _pipelines
@@ -0,0 +1,186 @@
+from document_text import RELS
+from lxml import etree
+import os
+import struct
+import zipfile
+import zlib
+
+# Signatures and layouts of the ZIP records written, see the .ZIP File Format Specification (APPNOTE.TXT)
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+CENTRAL_HEADER = struct.Struct('<4s6H3L5H2L')
+END_RECORD = struct.Struct('<4s4H2LH')
+LOCAL_SIGNATURE = b'PK\x03\x04'
+CENTRAL_SIGNATURE = b'PK\x01\x02'
+END_SIGNATURE = b'PK\x05\x06'
+DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+
+# Flags of a member whose sizes follow its data, and of a UTF-8 name
+DATA_DESCRIPTOR = 0x08
+UTF8_NAME = 0x800
+
+# Version of the format needed to read a deflated member
+DEFLATE_VERSION = 20
+
+# Largest size, offset and member count of a ZIP file without ZIP64 records
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_MEMBERS = 0xFFFF
+
+COPY_BUFFER = 2 ** 20
+
+
+class PackageNotCopied(Exception):
+    """
+    Raised when a document cannot be saved by copying its package, because the package
+    was changed since it was loaded or uses ZIP features the copy does not handle.
+    The document should be saved in full instead.
+    """
+
+
+# Function to encode the name of a member the way it is stored in the file
+def get_member_name(info):
+    return info.orig_filename.encode('utf-8' if info.flag_bits & UTF8_NAME else 'cp437')
+
+
+# Function to copy the local header and data of a member of a ZIP file byte for byte, without decompressing it
+def copy_member(source, target, info):
+    source.seek(info.header_offset)
+    header = source.read(LOCAL_HEADER.size)
+    if len(header) < LOCAL_HEADER.size or header[:4] != LOCAL_SIGNATURE:
+        raise PackageNotCopied(f"bad local header for {info.filename}")
+    name_length, extra_length = LOCAL_HEADER.unpack(header)[-2:]
+
+    target.write(header)
+    length = name_length + extra_length + info.compress_size
+    while length:
+        chunk = source.read(min(length, COPY_BUFFER))
+        if not chunk:
+            raise PackageNotCopied(f"truncated data for {info.filename}")
+        target.write(chunk)
+        length -= len(chunk)
+
+    # CRC and sizes written after the data, with an optional signature
+    if info.flag_bits & DATA_DESCRIPTOR:
+        descriptor = source.read(4)
+        target.write(descriptor + source.read(12 if descriptor == DESCRIPTOR_SIGNATURE else 8))
+
+
+# Function to write a member with new content, deflated, returning the ZipInfo of what was written
+def write_member(target, info, data):
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+
+    member = zipfile.ZipInfo(info.filename, info.date_time)
+    member.orig_filename = info.orig_filename
+    member.flag_bits = info.flag_bits & UTF8_NAME
+    member.compress_type = zipfile.ZIP_DEFLATED
+    member.create_system, member.create_version = info.create_system, info.create_version
+    member.extract_version = max(info.extract_version, DEFLATE_VERSION)
+    member.external_attr, member.internal_attr = info.external_attr, info.internal_attr
+    member.comment, member.extra = info.comment, b''
+    member.CRC = zlib.crc32(data)
+    member.file_size, member.compress_size = len(data), len(compressed)
+
+    name = get_member_name(member)
+    year, month, day, hour, minute, second = member.date_time
+    target.write(LOCAL_HEADER.pack(
+        LOCAL_SIGNATURE, member.extract_version, member.flag_bits, member.compress_type,
+        hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day,
+        member.CRC, member.compress_size, member.file_size, len(name), 0))
+    target.write(name)
+    target.write(compressed)
+    return member
+
+
+# Function to write the central directory and end record of the members written, at their new offsets
+def write_central_directory(target, members, offsets, comment):
+    start = target.tell()
+    for member, offset in zip(members, offsets):
+        name = get_member_name(member)
+        year, month, day, hour, minute, second = member.date_time
+        target.write(CENTRAL_HEADER.pack(
+            CENTRAL_SIGNATURE, member.create_system << 8 | member.create_version, member.extract_version,
+            member.flag_bits, member.compress_type,
+            hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day,
+            member.CRC, member.compress_size, member.file_size,
+            len(name), len(member.extra), len(member.comment), 0, member.internal_attr,
+            member.external_attr, offset))
+        target.write(name)
+        target.write(member.extra)
+        target.write(member.comment)
+
+    end = target.tell()
+    if end > ZIP32_LIMIT:
+        raise PackageNotCopied("the copy needs ZIP64 records")
+    target.write(END_RECORD.pack(END_SIGNATURE, 0, 0, len(members), len(members), end - start, start, len(comment)))
+    target.write(comment)
+
+
+# Function to copy a ZIP file to target (a path or a writable binary file), replacing the content of some
+# members. Every other member is copied byte for byte, still compressed; the replaced ones are deflated.
+# Raises PackageNotCopied for ZIP64 files, which are left to zipfile, and when target is the source file,
+# which opening it for writing would empty before it is read.
+def copy_package(source, target, replaced):
+    with zipfile.ZipFile(source) as package:
+        infos = package.infolist()
+        comment = package.comment
+    if len(infos) > ZIP32_MEMBERS:
+        raise PackageNotCopied("too many members")
+    for info in infos:
+        # ZIP64 sizes and offsets would have to be rewritten in the extra fields
+        if max(info.header_offset, info.compress_size, info.file_size) >= ZIP32_LIMIT:
+            raise PackageNotCopied(f"{info.filename} needs ZIP64 records")
+
+    if isinstance(target, (str, os.PathLike)):
+        if os.path.exists(target) and os.path.samefile(source, target):
+            raise PackageNotCopied("the target is the source file")
+        with open(target, 'wb') as f:
+            return copy_package(source, f, replaced)
+
+    members = []
+    offsets = []
+    with open(source, 'rb') as f:
+        for info in infos:
+            offset = target.tell()
+            if offset > ZIP32_LIMIT:
+                raise PackageNotCopied("the copy needs ZIP64 records")
+            if info.filename in replaced:
+                members.append(write_member(target, info, replaced[info.filename]))
+            else:
+                copy_member(f, target, info)
+                members.append(info)
+            offsets.append(offset)
+    write_central_directory(target, members, offsets, comment)
+
+
+# Function to get the relationships of a .rels member of a package as {id: (type, target, external)}
+def read_relationships(package, name):
+    try:
+        rels = etree.fromstring(package.read(name))
+    except KeyError:
+        return {}
+    return {rel.get('Id'): (rel.get('Type'), rel.get('Target'), rel.get('TargetMode') == 'External')
+            for rel in rels.iter(f'{{{RELS}}}Relationship')}
+
+
+# Function to get the relationships of a python-docx part or package like read_relationships does
+def get_relationships(source):
+    return {rId: (rel.reltype, rel.target_ref, rel.is_external) for rId, rel in source.rels.items()}
+
+
+# Function to save a document loaded with python-docx from path by copying path and rewriting only its
+# main document part, when that is the only part that can have changed: the file has no other parts,
+# and no relationships, than the ones it was loaded with.
+# Raises PackageNotCopied otherwise, and the document should be saved with Document.save.
+def save_main_part(document, path, target):
+    package = document.part.package
+    with zipfile.ZipFile(path) as original:
+        names = set(original.namelist())
+        if get_relationships(package) != read_relationships(original, '_rels/.rels'):
+            raise PackageNotCopied("the package relationships changed")
+        for part in package.iter_parts():
+            if part.partname.lstrip('/') not in names:
+                raise PackageNotCopied(f"{part.partname} was added")
+            if get_relationships(part) != read_relationships(original, part.partname.rels_uri.lstrip('/')):
+                raise PackageNotCopied(f"the relationships of {part.partname} changed")
+
+    copy_package(path, target, {document.part.partname.lstrip('/'): document.part.blob})
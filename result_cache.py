@@ -0,0 +1,264 @@
+from contextlib import contextmanager
+from abbreviation_detector import (emit_progress, merge_abbreviations, get_paragraph_contexts,
+                                   find_paragraph_candidates, DETECTOR_VERSION)
+import model_registry
+from instrumentation import measure
+from utils import get_user_data_folder
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Default size limit of the cache, least recently used results are evicted above it
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+# Tables of the cache: results of whole documents, and candidates of single paragraphs
+TABLES = ('results', 'paragraphs')
+
+# Largest number of keys looked up in one query, below SQLite's limit on query parameters
+QUERY_KEYS = 500
+
+# Largest block of changed paragraphs parsed at once, in characters
+BLOCK_CHARS = 100000
+
+
+# Function to build the cache key of a text for the current detector and its settings
+def cache_key(text, threshold=80, fast=False):
+    digest = hashlib.sha256()
+    digest.update(f"{DETECTOR_VERSION}\0{threshold}\0{int(fast)}\0".encode('utf-8'))
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Function to build the cache key of a paragraph, which also covers the words around it
+# since they can change the abbreviations found in the paragraph
+def paragraph_key(paragraph, before, after, threshold=80, fast=False):
+    digest = hashlib.sha256()
+    digest.update(f"{DETECTOR_VERSION}\0{threshold}\0{int(fast)}\0".encode('utf-8'))
+    digest.update(f"{before}\0{paragraph}\0{after}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    An on-disk SQLite cache of the abbreviations found in documents, keyed by cache_key,
+    and of the candidates found in single paragraphs, keyed by paragraph_key.
+
+    Each call opens its own connection, so one cache can be used from the GUI thread,
+    worker threads and pool processes alike.
+
+    Attributes
+    ----------
+    path : str
+        the path of the SQLite database
+    max_bytes : int
+        size limit of the stored results, least recently used ones are evicted above it
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Parameters:
+        -----------
+        path : str
+            The path of the SQLite database, by default in the user's data folder.
+        max_bytes : int
+            Size limit of the stored results.
+        """
+        if path is None:
+            folder = get_user_data_folder()
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, 'results.sqlite3')
+        self.path = path
+        self.max_bytes = max_bytes
+
+        with self._connect() as conn:
+            for table in TABLES:
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ("
+                             "key TEXT PRIMARY KEY, abbreviations TEXT NOT NULL, "
+                             "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        # Commit (or roll back) the transaction, then close the connection
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """
+        Returns the cached abbreviations for a key, or None when there are none.
+        """
+        return self._get_many('results', [key]).get(key)
+
+    def put(self, key, abbreviations):
+        """
+        Stores the abbreviations for a key, evicting the least recently used results if needed.
+        """
+        self._put_many('results', {key: abbreviations})
+
+    def get_paragraphs(self, keys):
+        """
+        Returns a dictionary of the cached paragraph candidates found for the given keys.
+        """
+        return self._get_many('paragraphs', keys)
+
+    def put_paragraphs(self, candidates):
+        """
+        Stores paragraph candidates given as a dictionary keyed by paragraph_key.
+        """
+        self._put_many('paragraphs', candidates)
+
+    def _get_many(self, table, keys):
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._connect() as conn:
+            for i in range(0, len(keys), QUERY_KEYS):
+                batch = keys[i:i + QUERY_KEYS]
+                marks = ','.join('?' * len(batch))
+                rows = conn.execute(f"SELECT key, abbreviations FROM {table} WHERE key IN ({marks})", batch)
+                found.update((key, json.loads(data)) for key, data in rows)
+                # Mark the results as recently used
+                conn.execute(f"UPDATE {table} SET last_used = ? WHERE key IN ({marks})", [now] + batch)
+        return found
+
+    def _put_many(self, table, items):
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            data = json.dumps(value, ensure_ascii=False)
+            rows.append((key, data, len(data.encode('utf-8')) + len(key), now))
+
+        with self._connect() as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO {table} (key, abbreviations, size, last_used) VALUES (?, ?, ?, ?)",
+                             rows)
+            self._evict(conn)
+
+    def _evict(self, conn):
+        union = " UNION ALL ".join(f"SELECT '{table}', key, size, last_used FROM {table}" for table in TABLES)
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM ({union})").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Delete the least recently used entries of both tables until the cache fits again
+        for table, key, size, _ in conn.execute(f"{union} ORDER BY last_used").fetchall():
+            conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """
+        Removes every cached result.
+        """
+        with self._connect() as conn:
+            for table in TABLES:
+                conn.execute(f"DELETE FROM {table}")
+
+
+# Process-wide cache, opened on first use
+_default_cache = None
+
+
+# Function to return the process-wide cache in the user's data folder
+def get_default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
+
+
+# Function to split the positions of the changed paragraphs into runs of consecutive paragraphs,
+# each holding at most about BLOCK_CHARS characters
+def get_changed_blocks(changed, paragraphs):
+    blocks = []
+    size = 0
+    for k in changed:
+        if blocks and blocks[-1][-1] == k - 1 and size < BLOCK_CHARS:
+            blocks[-1].append(k)
+        else:
+            blocks.append([k])
+            size = 0
+        size += len(paragraphs[k]) + 1
+    return blocks
+
+
+# Function to find the abbreviations of a document given as its paragraphs, parsing only the paragraphs
+# (and their neighbours) that changed since the document was last processed.
+# The candidates of each paragraph are cached, and merged again into the document's abbreviations.
+def find_abbreviations_incremental(paragraphs, signal=None, fast=False, cache=None, threshold=80):
+    if cache is None:
+        cache = get_default_cache()
+    paragraphs = list(paragraphs)
+
+    # The whole document may not have changed at all
+    with measure(signal, "cache_lookup"):
+        key = cache_key(' '.join(paragraphs), threshold, fast)
+        abbreviations = cache.get(key)
+    if abbreviations is not None:
+        emit_progress(signal, 70)
+        return abbreviations
+
+    with measure(signal, "cache_lookup"):
+        contexts = get_paragraph_contexts(paragraphs)
+        fingerprints = [paragraph_key(paragraph, before, after, threshold, fast)
+                        for paragraph, (before, after) in zip(paragraphs, contexts)]
+        candidates = cache.get_paragraphs(fingerprints)
+    changed = [k for k, fingerprint in enumerate(fingerprints) if fingerprint not in candidates]
+
+    if changed:
+        with measure(signal, "load_model"):
+            try:
+                nlp = model_registry.get_nlp(fast=fast)
+            except Exception as e:
+                print(model_registry.BASE_DIR, "ERROR", e)
+                return {}
+            matcher = model_registry.get_matcher(fast=fast)
+        emit_progress(signal, 30)
+
+        # Progress follows the words parsed, so a block of long paragraphs moves it further
+        words = {k: len(paragraphs[k].split()) for k in changed}
+        total = sum(words.values()) or 1
+
+        # Parse each run of changed paragraphs once, with the words around it
+        new_candidates = {}
+        done = 0
+        for block in get_changed_blocks(changed, paragraphs):
+            block_candidates = find_paragraph_candidates([paragraphs[k] for k in block], contexts[block[0]][0],
+                                                         contexts[block[-1]][1], nlp, matcher, threshold, signal)
+            for k, paragraph_candidates in zip(block, block_candidates):
+                # scispacy keeps only the first definition of a short form in a parse, so of two copies of a
+                # paragraph (same text and context) only the first gets it: keep it for both
+                previous = new_candidates.setdefault(fingerprints[k], paragraph_candidates)
+                for abbr, long_form in paragraph_candidates["scispacy"].items():
+                    previous["scispacy"].setdefault(abbr, long_form)
+
+            done += sum(words[k] for k in block)
+            emit_progress(signal, 30 + 30 * done // total)
+
+        candidates.update(new_candidates)
+        with measure(signal, "cache_store"):
+            cache.put_paragraphs(new_candidates)
+
+    # Merge the candidates of every paragraph in document order
+    with measure(signal, "merge_abbreviations"):
+        full_forms = dict()
+        scispacy_abbreviations = dict()
+        for fingerprint in fingerprints:
+            for abbr, forms in candidates[fingerprint]["full_forms"].items():
+                full_forms.setdefault(abbr, []).extend(forms)
+            for abbr, long_form in candidates[fingerprint]["scispacy"].items():
+                scispacy_abbreviations.setdefault(abbr, long_form)
+
+        abbreviations = merge_abbreviations(full_forms, scispacy_abbreviations)
+    emit_progress(signal, 70)
+
+    if abbreviations:
+        with measure(signal, "cache_store"):
+            cache.put(key, abbreviations)
+    return abbreviations
@@ -0,0 +1,143 @@
+from copy import deepcopy
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import Pt, Inches
+from lxml import etree
+import re
+
+# Tags and attributes written for every cell, resolved once
+RUN = qn('w:r')
+TEXT = qn('w:t')
+TAB = qn('w:tab')
+BREAK = qn('w:br')
+STYLE_VALUE = qn('w:val')
+GRID_WIDTH = qn('w:w')
+SPACE = qn('xml:space')
+
+# Characters python-docx writes as run elements of their own instead of text
+RUN_BREAKS = re.compile(r'(\t|\r|\n)')
+
+
+class TableTemplate:
+    """
+    Pre-built styling of a table of abbreviations, like the one
+    DocAcronymMaster.update_document inserts.
+
+    The styling fragments (table properties, header row height, shading, column widths,
+    bold run properties) are parsed once, into a header row and an empty body row.
+    Tables are then built by deep-copying those rows and filling in their text,
+    so no XML is parsed for the rows or cells of a table.
+
+    Attributes
+    ----------
+    widths : tuple
+        the width of each column
+    shading : str
+        the fill color of the header cells, as a hex RGB string
+    header_height : Length
+        the height of the header row
+    """
+
+    def __init__(self, widths=(Inches(0.1), Inches(2)), shading='590B0B', header_height=Pt(12)):
+        self.widths = widths
+        self.shading = shading
+        self.header_height = header_height
+
+        # Styling fragments of the cells
+        cell_widths = [f'<w:tcW w:type="dxa" w:w="{width.twips}"/>' for width in widths]
+        shading = f'<w:shd w:fill="{shading}"/>'
+        bold = '<w:rPr><w:b/></w:rPr>'
+
+        # Table properties and grid, the style and grid widths are set for each document
+        self.table = parse_xml(
+            f'<w:tbl {nsdecls("w")}><w:tblPr><w:tblStyle w:val=""/><w:tblW w:type="auto" w:w="0"/>'
+            '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+            'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+            f'<w:tblGrid>{"<w:gridCol/>" * len(widths)}</w:tblGrid></w:tbl>')
+
+        # Header row: shaded cells, each with a run for its title and an empty bold run after it
+        self.header_row = parse_xml(
+            f'<w:tr {nsdecls("w")}><w:trPr><w:trHeight w:val="{header_height.twips}"/></w:trPr>'
+            + ''.join(f'<w:tc><w:tcPr>{width}{shading}</w:tcPr><w:p><w:r/><w:r>{bold}</w:r></w:p></w:tc>'
+                      for width in cell_widths)
+            + '</w:tr>')
+
+        # Body row: plain cells with a single run
+        self.body_row = parse_xml(
+            f'<w:tr {nsdecls("w")}>'
+            + ''.join(f'<w:tc><w:tcPr>{width}</w:tcPr><w:p><w:r/></w:p></w:tc>' for width in cell_widths)
+            + '</w:tr>')
+
+        # Runs to fill in, by position among the runs of each row
+        self.header_runs = list(range(0, 2 * len(widths), 2))
+        self.body_runs = list(range(len(widths)))
+
+    @staticmethod
+    def set_run_text(run, text):
+        """
+        Writes text into an empty run the way python-docx's Run.text does: tabs become w:tab,
+        line breaks become w:br, and text with leading or trailing whitespace keeps it
+        with xml:space="preserve".
+        """
+        if '\t' in text or '\r' in text or '\n' in text:
+            pieces = RUN_BREAKS.split(text)
+        else:
+            pieces = [text]
+
+        for piece in pieces:
+            if piece == '\t':
+                etree.SubElement(run, TAB)
+            elif piece in ('\r', '\n'):
+                etree.SubElement(run, BREAK)
+            elif piece:
+                element = etree.SubElement(run, TEXT)
+                element.text = piece
+                if len(piece.strip()) < len(piece):
+                    element.set(SPACE, 'preserve')
+
+    @staticmethod
+    def fill_row(template, texts, positions):
+        """
+        Returns a copy of a template row with texts written into the runs at positions.
+        """
+        row = deepcopy(template)
+        runs = list(row.iter(RUN))
+        for position, text in zip(positions, texts):
+            TableTemplate.set_run_text(runs[position], text)
+        return row
+
+    def make_table(self, header, rows, style_id=None, grid_width=None):
+        """
+        Builds a new table element.
+
+        Parameters:
+        -----------
+        header : tuple
+            The title of each column.
+        rows : iterable
+            A tuple of the cell texts of each row, like the items of a dictionary of abbreviations.
+        style_id : str
+            The id of the table style, or None to use the default table style of the document.
+        grid_width : Length
+            The width of each column of the table grid, or None to leave it to Word.
+        """
+        table = deepcopy(self.table)
+        properties, grid = table[0], table[1]
+
+        style = properties[0]
+        if style_id:
+            style.set(STYLE_VALUE, style_id)
+        else:
+            properties.remove(style)
+        if grid_width is not None:
+            for column in grid:
+                column.set(GRID_WIDTH, str(grid_width.twips))
+
+        table.append(TableTemplate.fill_row(self.header_row, header, self.header_runs))
+        body_row, body_runs = self.body_row, self.body_runs
+        table.extend(TableTemplate.fill_row(body_row, texts, body_runs) for texts in rows)
+        return table
+
+
+# Template of the table of abbreviations
+abbreviations_table = TableTemplate()
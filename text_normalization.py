@@ -0,0 +1,218 @@
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+import re
+
+# Symbols removed from the text before it is parsed, and from the tokens of a parsed document
+SYMBOLS = ",()’-"
+# Symbols removed from an abbreviation before it is matched against the capitals of a full form
+ABBREVIATION_SYMBOLS = "@&/\\"
+
+# An abbreviation ending with a letter followed by a count, like 'A3'
+TRAILING_COUNT = re.compile(r"([a-zA-Z])(\d+)$")
+
+# A position in the paragraphs a NormalizedText was built from:
+# paragraph index of the paragraph in that list
+# offset    offset of the character in the text of the paragraph
+Position = namedtuple('Position', ['paragraph', 'offset'])
+
+
+class OffsetMap:
+    """
+    Maps offsets in a text with characters removed back to offsets in the original text.
+
+    Only the places where characters were removed are stored, in two arrays: the
+    offset in the new text right after each removal, and how many characters were
+    removed up to there. Memory grows with the number of removals, not with the
+    length of the text, and a lookup is a binary search.
+    """
+
+    def __init__(self):
+        self.breakpoints = array('q')
+        self.shifts = array('q')
+
+    def add_removal(self, offset, removed):
+        """
+        Records that removed characters in total were removed before offset of the new text.
+        Removals must be added in order.
+        """
+        self.breakpoints.append(offset)
+        self.shifts.append(removed)
+
+    def to_original(self, offset):
+        """
+        Returns the offset in the original text of the character at offset in the new text.
+        """
+        index = bisect_right(self.breakpoints, offset)
+        return offset + self.shifts[index - 1] if index else offset
+
+    def to_original_span(self, start, end):
+        """
+        Returns the original (start, end) of the span [start, end) of the new text,
+        leaving out removed characters at its end.
+        """
+        if end <= start:
+            original = self.to_original(start)
+            return original, original
+        return self.to_original(start), self.to_original(end - 1) + 1
+
+
+class SymbolRemover:
+    """
+    Removes a set of symbols from strings, with the translation table built once.
+
+    ASCII text is translated in a single pass. CPython only has a fast path for
+    str.translate on ASCII text, so other text goes through one str.replace per
+    symbol, which scans at memchr speed and only copies the text when the symbol
+    is in it. Short strings like tokens are returned as they are when they hold
+    none of the symbols, which is cheaper than translating them.
+
+    Attributes
+    ----------
+    symbols : str
+        the symbols removed
+    """
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.symbol_set = frozenset(symbols)
+        self.table = str.maketrans('', '', symbols)
+        self.pattern = re.compile(f"[{re.escape(symbols)}]+")
+
+    def remove(self, text):
+        """
+        Returns text without the symbols, for long texts like a whole document.
+        """
+        if text.isascii():
+            return text.translate(self.table)
+        for symbol in self.symbols:
+            text = text.replace(symbol, '')
+        return text
+
+    def remove_from_word(self, word):
+        """
+        Returns word without the symbols, for short strings like tokens and abbreviations.
+        """
+        if self.symbol_set.isdisjoint(word):
+            return word
+        return word.translate(self.table)
+
+    def remove_with_offsets(self, text):
+        """
+        Returns text without the symbols, like remove, and the OffsetMap from the
+        returned text back to text.
+        """
+        pieces = []
+        offsets = OffsetMap()
+        last = 0
+        removed = 0
+        for match in self.pattern.finditer(text):
+            start, end = match.span()
+            pieces.append(text[last:start])
+            # The next character kept lands where the removed ones started, less the ones removed before them
+            offsets.add_removal(start - removed, removed + end - start)
+            removed += end - start
+            last = end
+        pieces.append(text[last:])
+        return ''.join(pieces), offsets
+
+
+symbol_remover = SymbolRemover(SYMBOLS)
+abbreviation_symbol_remover = SymbolRemover(ABBREVIATION_SYMBOLS)
+
+
+# Function to remove the symbols from a text
+def remove_symbols(text):
+    return symbol_remover.remove(text)
+
+
+# Function to remove the symbols from a single word or token
+def remove_word_symbols(word):
+    return symbol_remover.remove_from_word(word)
+
+
+# Function to clean an abbreviation by removing certain special characters
+def clean_abbreviation(abbreviation):
+    return abbreviation_symbol_remover.remove_from_word(abbreviation)
+
+
+# Function to multiply last character in a string if it's followed by a digit.
+# For example, 'A3' becomes 'AAA', 'B2' becomes 'BB' etc. Returns None for other strings.
+def replicate_last_char(input_str):
+    # Search for a pattern that ends with a letter followed by one or more digits
+    match = TRAILING_COUNT.search(input_str)
+    if match:
+        # If pattern is found, extract the letter and digit
+        letter, count = match.groups()
+        # Return the string with last digit characters replaced by the replicated last letter
+        return input_str[:-len(count)] + letter * (int(count) - 1)
+
+
+class NormalizedText:
+    """
+    The text of a list of paragraphs, joined with a separator the way the detectors
+    join them, with the symbols removed, that maps its offsets back to the paragraphs.
+
+    Detections found in the normalized text, like an abbreviation or its full form,
+    can then be located in the document without searching it again: the paragraph
+    is the index in the list given, like the fragments of DocAcronymMaster.iter_fragments,
+    and document_text.locate_run finds the run within it.
+
+    Attributes
+    ----------
+    text : str
+        the normalized text
+    offsets : OffsetMap
+        the map from the normalized text to the joined paragraphs
+    starts : array
+        the offset of each paragraph in the joined paragraphs
+    """
+
+    def __init__(self, paragraphs, separator=' ', remover=symbol_remover):
+        self.starts = array('q')
+        position = 0
+        for paragraph in paragraphs:
+            self.starts.append(position)
+            position += len(paragraph) + len(separator)
+        self.text, self.offsets = remover.remove_with_offsets(separator.join(paragraphs))
+
+    def locate(self, offset):
+        """
+        Returns the Position of the character at offset of the normalized text,
+        or None when there are no paragraphs.
+        """
+        return self.locate_original(self.offsets.to_original(offset))
+
+    def locate_original(self, offset):
+        """
+        Returns the Position of the character at offset of the joined paragraphs, like the
+        occurrences abbreviation_detector.find_abbreviations finds in them, or None when
+        there are no paragraphs. Separators belong to the paragraph before them.
+        """
+        if not self.starts:
+            return None
+        index = bisect_right(self.starts, offset) - 1
+        return Position(index, offset - self.starts[index])
+
+    def locate_span(self, start, end):
+        """
+        Returns the Positions of the start and end of the span [start, end) of the normalized
+        text, the end being just after its last character, or None when there are no paragraphs.
+        """
+        if not self.starts:
+            return None
+        original_start, original_end = self.offsets.to_original_span(start, end)
+        if original_end <= original_start:
+            position = self.locate_original(original_start)
+            return position, position
+        # The end is found from the last character, so it stays in the same paragraph
+        paragraph, offset = self.locate_original(original_end - 1)
+        return self.locate_original(original_start), Position(paragraph, offset + 1)
+
+    def find(self, word):
+        """
+        Returns the (start, end) Positions of every occurrence of word in the normalized text
+        as a whole word, like an abbreviation detected in it.
+        """
+        pattern = re.compile(rf"(?<!\w){re.escape(word)}(?!\w)")
+        return [self.locate_span(*match.span()) for match in pattern.finditer(self.text)]
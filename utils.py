@@ -1,6 +1,16 @@
-import winreg
+import os
+import shutil
+
+# winreg only exists on Windows; headless runs on Linux servers go without it
+try:
+    import winreg
+except ImportError:
+    winreg = None
 
 def get_users_desktop_folder():
+    if winreg is None:
+        return os.path.join(os.path.expanduser("~"), "Desktop")
+
     # Open the registry key for the desktop folder
     key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Explorer\Shell Folders")
 
@@ -8,3 +18,18 @@ def get_users_desktop_folder():
     desktop_path = winreg.QueryValueEx(key, "Desktop")[0]
 
     return desktop_path
+
+def get_user_data_folder():
+    # Folder for the application's own files, such as the results cache
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+        return os.path.join(base, "Acronym Master")
+
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "acronym-master")
+
+def write_buffer(buffer, path):
+    # Write a saved file kept in a buffer (see DocAcronymMaster.save_to_buffer) to path
+    buffer.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(buffer, f)
@@ -0,0 +1,249 @@
+from PyQt5 import QtCore
+from concurrent.futures import wait, FIRST_COMPLETED
+from multiprocessing import Manager
+from queue import Empty
+from instrumentation import PipelineMonitor, measure, report_path
+import os
+
+# The document and detection modules (python-docx, spaCy, scispacy) take about a second to import,
+# so they are imported by the workers, off the GUI thread, instead of when the window is created.
+
+
+# Function to import the detection modules and load the spaCy pipeline in the background,
+# so the first document does not wait for them
+def warm_up_pipeline():
+    try:
+        # Imported only to fill the module cache for the workers
+        import docacronym_master  # noqa: F401
+        import result_cache  # noqa: F401
+        import model_registry
+        model_registry.warm_up()
+    except Exception as e:
+        # The worker reports the error again if the first document fails to load the pipeline
+        print("Could not warm up the pipeline:", e)
+
+
+class ProcessingCancelled(Exception):
+    """
+    Raised inside a worker when the user cancels the document being processed.
+    """
+
+
+class CancellableProgress:
+    """
+    Forwards progress values to a Qt signal and stops the work once cancelled.
+
+    find_abbreviations reports progress between its stages, so checking the
+    cancellation flag on every emit lets it stop without knowing about Qt threads.
+    """
+
+    def __init__(self, signal, is_cancelled):
+        self.signal = signal
+        self.is_cancelled = is_cancelled
+        self.progress = 0
+
+    def emit(self, value):
+        if self.is_cancelled():
+            raise ProcessingCancelled()
+        # Progress never goes backwards, whichever stage reports it
+        self.progress = max(self.progress, value)
+        self.signal.emit(self.progress)
+
+
+class DocumentWorker(QtCore.QObject):
+    """
+    Runs the document pipeline (load, find abbreviations, update) off the GUI thread.
+
+    Signals
+    -------
+    progress(int)
+        Progress of the document in percent.
+    finished(str, str)
+        Path the updated document will be saved to, and the name of the uploaded file.
+        The updated document is saved in the document attribute by then, see
+        DocAcronymMaster.save_to_buffer.
+    failed(str)
+        Error message when the document could not be processed.
+    cancelled()
+        Emitted when processing stopped because of cancel().
+
+    When a report folder is given, a performance report of the document is written to it
+    (see instrumentation.PipelineMonitor), with cProfile statistics if profile is set.
+    """
+
+    progress = QtCore.pyqtSignal(int)
+    finished = QtCore.pyqtSignal(str, str)
+    failed = QtCore.pyqtSignal(str)
+    cancelled = QtCore.pyqtSignal()
+
+    def __init__(self, file, report_folder=None, profile=False):
+        super().__init__()
+        self.file = file
+        self.report_folder = report_folder
+        self.profile = profile
+        self.docMaster = None
+        self.document = None
+        self._cancelled = False
+
+    def cancel(self):
+        # Checked by the worker thread at the next progress update
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        progress = CancellableProgress(self.progress, self.is_cancelled)
+        if self.report_folder:
+            progress = PipelineMonitor(progress, self.profile)
+        try:
+            filepath, filename = self.process(progress)
+        except ProcessingCancelled:
+            self.release()
+            self.cancelled.emit()
+        except Exception as e:
+            self.release()
+            self.failed.emit(str(e))
+        else:
+            if self.report_folder:
+                self.write_report(progress)
+            self.finished.emit(filepath, filename)
+        finally:
+            if isinstance(progress, PipelineMonitor):
+                progress.stop()
+
+    def release(self):
+        # Drop the loaded document and the saved copy of a document that was not finished
+        self.docMaster = None
+        if self.document is not None:
+            self.document.close()
+            self.document = None
+
+    def write_report(self, monitor):
+        # A report that cannot be written must not fail the document
+        try:
+            os.makedirs(self.report_folder, exist_ok=True)
+            monitor.dump(report_path(self.file, self.report_folder), document=self.file, mode="incremental")
+        except OSError as e:
+            print("Could not write the performance report:", e)
+
+    def process(self, progress):
+        from docacronym_master import DocAcronymMaster
+        from result_cache import find_abbreviations_incremental
+
+        with measure(progress, "load_document"):
+            self.docMaster = DocAcronymMaster(self.file)
+        # Emit signal
+        progress.emit(10)
+
+        # get the paragraphs of the document, with its tables, text boxes, headers, footers and notes
+        with measure(progress, "get_paragraphs"):
+            paragraphs = [fragment.text for fragment in self.docMaster.iter_fragments()]
+
+        # Emit signal
+        progress.emit(20)
+
+        # get the abbreviations in the text, re-parsing only the paragraphs that changed since the last run
+        abbreviations = find_abbreviations_incremental(paragraphs, progress)
+        # update the document with the table of abbreviations
+        fullpath, filename = os.path.split(self.file)
+        filepath = os.path.join(fullpath, f'{os.path.splitext(filename)[0]}-updated.docx')
+        # Emit signal
+        progress.emit(90)
+
+        with measure(progress, "update_document"):
+            self.docMaster.update_document(abbreviations, filepath)
+
+        # Save the updated document once, so downloading it is a copy, and release the loaded document
+        with measure(progress, "saveDocument"):
+            self.document = self.docMaster.save_to_buffer()
+        self.docMaster = None
+
+        # Emit signal
+        progress.emit(100)
+
+        return filepath, filename
+
+
+class BatchWorker(QtCore.QObject):
+    """
+    Processes several documents at once in a pool of processes, each holding a warm pipeline.
+
+    Every updated document is written as soon as its process finishes with it.
+
+    Signals
+    -------
+    fileProgress(str, int)
+        Progress of one document in percent.
+    fileFinished(str, str)
+        A document and the path its updated copy was written to.
+    fileFailed(str, str)
+        A document and the error message it failed with. If the pool itself fails, every
+        document not done yet is reported as failed with its error.
+    finished()
+        Emitted once every document is done, failed or cancelled, whatever happened.
+    """
+
+    fileProgress = QtCore.pyqtSignal(str, int)
+    fileFinished = QtCore.pyqtSignal(str, str)
+    fileFailed = QtCore.pyqtSignal(str, str)
+    finished = QtCore.pyqtSignal()
+
+    # Seconds to wait for a document to finish before forwarding queued progress again
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, files, max_workers=None):
+        super().__init__()
+        self.files = files
+        self.max_workers = max_workers
+        self._cancelled = False
+
+    def cancel(self):
+        # Documents not yet started are dropped; the ones in progress are allowed to finish
+        self._cancelled = True
+
+    def run(self):
+        # Documents whose outcome was reported
+        reported = set()
+        try:
+            import batch
+
+            with Manager() as manager, batch.create_pool(len(self.files), self.max_workers) as pool:
+                queue = manager.Queue()
+                futures = {pool.submit(batch.process_document, file, queue): file for file in self.files}
+                pending = set(futures)
+
+                while pending:
+                    if self._cancelled:
+                        for future in pending:
+                            future.cancel()
+
+                    done, pending = wait(pending, timeout=self.POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                    self.forward_progress(queue)
+
+                    for future in done:
+                        file = futures[future]
+                        reported.add(file)
+                        if future.cancelled():
+                            self.fileFailed.emit(file, "Cancelled")
+                        elif future.exception() is not None:
+                            self.fileFailed.emit(file, str(future.exception()))
+                        else:
+                            self.fileFinished.emit(file, future.result())
+        except Exception as e:
+            # The pool could not be started or stopped working: the documents left failed with it
+            for file in self.files:
+                if file not in reported:
+                    self.fileFailed.emit(file, str(e))
+        finally:
+            # The window waits for this to take new documents again
+            self.finished.emit()
+
+    def forward_progress(self, queue):
+        # Re-emit the progress the pool processes queued up as Qt signals
+        while True:
+            try:
+                file, value = queue.get_nowait()
+            except Empty:
+                return
+            self.fileProgress.emit(file, value)